@@ -0,0 +1,42 @@
+import argparse
+import sys
+
+from ocr.batch import WRITERS, run_batch
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        description="Пакетное распознавание адресов без UI"
+    )
+    arg_parser.add_argument(
+        "source", help="Папка с изображениями или файл-манифест (путь на строку)"
+    )
+    arg_parser.add_argument(
+        "-o", "--output", help="Файл результатов (по умолчанию stdout)"
+    )
+    arg_parser.add_argument(
+        "-f",
+        "--format",
+        choices=sorted(WRITERS),
+        help="Формат вывода (по умолчанию по расширению файла, иначе jsonl)",
+    )
+    arg_parser.add_argument(
+        "-w", "--workers", type=int, help="Число процессов (по умолчанию = ядрам CPU)"
+    )
+    arg_parser.add_argument(
+        "-t", "--threads-per-worker", type=int, help="Потоков torch/OpenCV на процесс"
+    )
+    args = arg_parser.parse_args()
+
+    errors = run_batch(
+        args.source,
+        output=args.output,
+        fmt=args.format,
+        workers=args.workers,
+        threads_per_worker=args.threads_per_worker,
+    )
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,311 @@
+"""
+Бенчмарк цепочки OCR -> разбор адреса на синтетических табличках.
+
+    python -m benchmarks.run -n 30 -o bench.json
+    python -m benchmarks.run --layers parse --compare bench.json
+    python -m benchmarks.run --layers ocr --ocr-modes config adaptive-scale plate-crop
+
+Работает офлайн на CPU. Слой ocr требует скачанных заранее весов easyocr
+(~/.EasyOCR); если модель не загрузилась, слой пропускается с ошибкой в отчёте.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from benchmarks import synthetic
+from config import Config
+
+LAYERS = ["binarization", "preprocess", "ocr", "parse"]
+
+# Варианты OCR для сравнения (--ocr-modes). "config" - как в
+# Config; остальные переопределяют только перечисленные настройки
+OCR_MODES = {
+    "config": {},
+    "adaptive-scale": {"OCR_ADAPTIVE_SCALE": True},
+    "plate-crop": {"OCR_PLATE_CROP": True},
+}
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def max_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдаёт килобайты, macOS - байты
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def measure(items, func, memory_items=3):
+    """
+    Прогоняет func по всем items. Возвращает (статистика, результаты).
+    Вывод func в stdout подавляется, чтобы отладочная печать не мешала отчёту
+    (сами затраты на форматирование при этом учитываются).
+    Пик памяти меряется отдельным коротким прогоном под tracemalloc,
+    чтобы его накладные расходы не искажали время.
+    """
+    latencies = []
+    outputs = []
+
+    with contextlib.redirect_stdout(io.StringIO()) as sink:
+        started = time.perf_counter()
+        for item in items:
+            item_started = time.perf_counter()
+            outputs.append(func(item))
+            latencies.append(time.perf_counter() - item_started)
+            sink.seek(0)
+            sink.truncate()
+        total = time.perf_counter() - started
+
+        tracemalloc.start()
+        for item in items[:memory_items]:
+            func(item)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    stats = {
+        "count": len(latencies),
+        "p50_ms": percentile(latencies, 50) * 1000 if latencies else None,
+        "p95_ms": percentile(latencies, 95) * 1000 if latencies else None,
+        "mean_ms": total / len(latencies) * 1000 if latencies else None,
+        "items_per_sec": len(latencies) / total if total else None,
+        "peak_python_mb": peak / (1024 * 1024),
+        "max_rss_mb": max_rss_mb(),
+    }
+    return stats, outputs
+
+
+def parse_accuracy(parsed_list, samples):
+    fields = ["street_type", "street_name", "house_number"]
+    correct = {field: 0 for field in fields}
+    exact = 0
+
+    for parsed, sample in zip(parsed_list, samples):
+        expected = sample["expected"]
+        matches = [
+            parsed.get(field, "").lower() == expected[field].lower() for field in fields
+        ]
+        for field, ok in zip(fields, matches):
+            correct[field] += ok
+        exact += all(matches)
+
+    total = len(samples) or 1
+    report = {field: correct[field] / total for field in fields}
+    report["exact"] = exact / total
+    return report
+
+
+def run(args):
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "images": args.count,
+            "seed": args.seed,
+            "ocr_execution_mode": Config.OCR_EXECUTION_MODE,
+            "ocr_cpu_threads": Config.OCR_CPU_THREADS,
+            "preprocess_pipeline": Config.PREPROCESS_PIPELINE,
+        },
+        "layers": {},
+        "accuracy": {},
+    }
+
+    samples = synthetic.make_samples(args.count, args.seed)
+    layers = args.layers
+
+    # Разбор адреса не нужен рендер: подаём идеальные блоки OCR
+    if "parse" in layers:
+        from parser.address import AddressParser
+
+        parser = AddressParser()
+        records = [sample["blocks"] for sample in samples] * args.parse_repeat
+        stats, parsed = measure(records, parser.parse)
+        report["layers"]["parse"] = stats
+        report["accuracy"]["parse_ideal_ocr"] = parse_accuracy(parsed, samples)
+
+        # parse_many разбирает одинаковые записи один раз, поэтому на
+        # размноженной выборке его выигрыш - в основном от повторов.
+        # Сравнение с циклом parse() идёт на уникальных записях (parse_unique
+        # и parse_many), размноженная выборка - отдельно (parse_many_dup).
+        # Задержка на запись у parse_many не определена, поэтому только
+        # среднее и пропускная способность
+        unique = list({tuple(record): record for record in records}.values())
+        report["layers"]["parse_unique"], _ = measure(unique, parser.parse)
+        for layer, items in (("parse_many", unique), ("parse_many_dup", records)):
+            started = time.perf_counter()
+            parser.parse_many(items)
+            total = time.perf_counter() - started
+            report["layers"][layer] = {
+                "count": len(items),
+                "unique": len(unique),
+                "mean_ms": total / len(items) * 1000,
+                "items_per_sec": len(items) / total,
+            }
+
+    image_layers = [layer for layer in layers if layer != "parse"]
+    if not image_layers:
+        return report
+
+    font = synthetic.find_font(args.font)
+    if font is None:
+        report["meta"]["error"] = "No Cyrillic font found, use --font"
+        return report
+
+    images = [image for image, _ in synthetic.make_dataset(args.count, font, args.seed)]
+
+    if "binarization" in layers:
+        from ocr.image_io import to_grayscale
+        from ocr.manual_algorithms import ManualBinarization
+
+        grays = [to_grayscale(image) for image in images]
+        report["layers"]["binarization"], _ = measure(
+            grays, lambda gray: ManualBinarization.sauvola(gray, 25, 0.2)
+        )
+
+    if "preprocess" in layers:
+        from ocr.preprocessor import ImagePreprocessor
+
+        report["layers"]["preprocess"], _ = measure(images, ImagePreprocessor.process)
+
+    if "ocr" in layers:
+        for mode in args.ocr_modes:
+            suffix = "" if len(args.ocr_modes) == 1 else f"[{mode}]"
+            with override_config(OCR_MODES[mode]):
+                error = measure_ocr(report, images, samples, suffix)
+            if error:
+                break
+
+    return report
+
+
+def measure_ocr(report, images, samples, suffix=""):
+    """
+    Слой ocr: задержка движка и точность всей цепочки. Возвращает текст
+    ошибки, если модель не загрузилась (тогда остальные режимы бессмысленны).
+    """
+    from parser.address import AddressParser
+
+    try:
+        from ocr.engine import OCREngine
+        from ocr.pipeline import AddressPipeline
+
+        engine = OCREngine(languages=Config.OCR_LANGUAGES, gpu=Config.OCR_GPU)
+        engine.wait_until_loaded()
+    except Exception as e:
+        report["layers"]["ocr" + suffix] = {"error": str(e)}
+        return str(e)
+
+    # Первый прогон прогревает модель и не учитывается
+    engine.process_image(images[0])
+    stats, ocr_results = measure(images, engine.process_image)
+    report["layers"]["ocr" + suffix] = stats
+
+    parser = AddressParser()
+    with contextlib.redirect_stdout(io.StringIO()):
+        parsed = [
+            parser.parse(AddressPipeline.texts_for_parser(results))
+            for results in ocr_results
+        ]
+    report["accuracy"]["end_to_end" + suffix] = parse_accuracy(parsed, samples)
+    return None
+
+
+@contextlib.contextmanager
+def override_config(values):
+    saved = {name: getattr(Config, name) for name in values}
+    for name, value in values.items():
+        setattr(Config, name, value)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(Config, name, value)
+
+
+def compare(report, baseline):
+    """Печатает изменение ключевых метрик относительно прошлого отчёта."""
+    print(f"{'layer':<14}{'metric':<16}{'baseline':>12}{'current':>12}{'change':>10}")
+    for layer, stats in report["layers"].items():
+        old = baseline.get("layers", {}).get(layer, {})
+        for metric in ("p50_ms", "p95_ms", "items_per_sec", "peak_python_mb"):
+            new_value, old_value = stats.get(metric), old.get(metric)
+            if new_value is None or old_value is None:
+                continue
+            change = (new_value / old_value - 1) * 100 if old_value else 0.0
+            print(
+                f"{layer:<14}{metric:<16}{old_value:>12.3f}{new_value:>12.3f}"
+                f"{change:>+9.1f}%"
+            )
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument(
+        "-n", "--count", type=int, default=20, help="Число табличек"
+    )
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument(
+        "--layers",
+        nargs="+",
+        choices=LAYERS,
+        default=LAYERS,
+        help="Какие слои измерять",
+    )
+    arg_parser.add_argument(
+        "--parse-repeat",
+        type=int,
+        default=50,
+        help="Во сколько раз размножить выборку для слоя parse (он очень быстрый)",
+    )
+    arg_parser.add_argument(
+        "--ocr-modes",
+        nargs="+",
+        choices=OCR_MODES,
+        default=["config"],
+        help="Варианты инференса для слоя ocr (каждый грузит модель заново)",
+    )
+    arg_parser.add_argument(
+        "--threads", type=int, help="Потоков torch (Config.OCR_CPU_THREADS)"
+    )
+    arg_parser.add_argument("--font", help="TTF-шрифт с кириллицей для рендера")
+    arg_parser.add_argument("-o", "--output", help="Куда сохранить JSON-отчёт")
+    arg_parser.add_argument("--compare", help="JSON-отчёт прошлой версии для сравнения")
+    args = arg_parser.parse_args()
+
+    if args.threads:
+        Config.OCR_CPU_THREADS = args.threads
+    report = run(args)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
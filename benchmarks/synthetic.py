@@ -0,0 +1,175 @@
+import os
+import random
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+# Шрифты с кириллицей, которые обычно есть в системе
+FONT_CANDIDATES = [
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    "/usr/share/fonts/TTF/DejaVuSans-Bold.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans-Bold.ttf",
+    "/Library/Fonts/Arial Unicode.ttf",
+    "/System/Library/Fonts/Supplemental/Arial Bold.ttf",
+    "C:\\Windows\\Fonts\\arialbd.ttf",
+    "C:\\Windows\\Fonts\\arial.ttf",
+]
+
+STREET_NAMES = [
+    "Тверская",
+    "Арбат",
+    "Тайнинская",
+    "Счастливая",
+    "Садовая",
+    "Лесная",
+    "Гагарина",
+    "Новослободская",
+    "Пушкина",
+    "Мира",
+    "Ленинградский",
+    "Кутузовский",
+]
+
+# (тип на табличке, тип, который должен вернуть парсер)
+STREET_TYPES = [
+    ("УЛИЦА", "улица"),
+    ("ул.", "ул."),
+    ("ПРОСПЕКТ", "проспект"),
+    ("переулок", "переулок"),
+    ("бульвар", "бульвар"),
+    ("шоссе", "шоссе"),
+]
+
+SIGN_BLUE = (0, 84, 166)  # Фон московской адресной таблички
+
+
+def find_font(path=None):
+    if path:
+        return path
+    for candidate in FONT_CANDIDATES:
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def make_samples(count, seed=0):
+    """
+    Описания табличек с эталонным результатом разбора.
+    blocks - текстовые блоки в том виде, в каком их вернул бы идеальный OCR.
+    """
+    rng = random.Random(seed)
+    samples = []
+    for _ in range(count):
+        name = rng.choice(STREET_NAMES)
+        sign_type, parsed_type = rng.choice(STREET_TYPES)
+        house = str(rng.randint(1, 250))
+        if rng.random() < 0.2:
+            house += rng.choice("абв")
+
+        type_first = rng.random() < 0.5
+        line = f"{sign_type} {name}" if type_first else f"{name} {sign_type}"
+        samples.append(
+            {
+                "lines": [line, house],
+                "blocks": (
+                    [sign_type, name, house] if type_first else [name, sign_type, house]
+                ),
+                "expected": {
+                    "street_type": parsed_type,
+                    "street_name": name,
+                    "house_number": house,
+                },
+            }
+        )
+    return samples
+
+
+def render_sign(
+    sample, font_path, width=1200, noise=0.0, shadow=0.0, angle=0.0, seed=0
+):
+    """
+    Рисует табличку на "фасаде" и возвращает BGR-изображение.
+    width - ширина всего кадра; табличка занимает около половины.
+    noise - СКО гауссова шума (0..1 от диапазона яркости).
+    shadow - сила тени, падающей на часть кадра (0..1).
+    angle - поворот таблички в градусах.
+    """
+    rng = np.random.default_rng(seed)
+    height = int(width * 0.75)
+
+    # Фасад: серо-бежевый фон с крупной текстурой
+    base = rng.normal(170, 12, (height // 8 + 1, width // 8 + 1, 3))
+    facade = cv2.resize(base, (width, height), interpolation=cv2.INTER_LINEAR)
+    facade = np.clip(facade, 0, 255).astype(np.uint8)
+
+    # Табличка
+    sign_w = width // 2
+    sign_h = sign_w // 3
+    sign = Image.new("RGB", (sign_w, sign_h), SIGN_BLUE)
+    draw = ImageDraw.Draw(sign)
+    border = max(2, sign_h // 30)
+    draw.rectangle(
+        [border, border, sign_w - border - 1, sign_h - border - 1],
+        outline=(255, 255, 255),
+        width=border,
+    )
+
+    street_line, house_line = sample["lines"]
+    street_font = ImageFont.truetype(font_path, max(8, sign_h // 5))
+    house_font = ImageFont.truetype(font_path, max(8, sign_h // 3))
+    draw.text(
+        (sign_w // 2, sign_h // 3),
+        street_line,
+        font=street_font,
+        fill="white",
+        anchor="mm",
+    )
+    draw.text(
+        (sign_w // 2, sign_h * 3 // 4),
+        house_line,
+        font=house_font,
+        fill="white",
+        anchor="mm",
+    )
+
+    sign_bgr = cv2.cvtColor(np.asarray(sign), cv2.COLOR_RGB2BGR)
+    if angle:
+        matrix = cv2.getRotationMatrix2D((sign_w / 2, sign_h / 2), angle, 1.0)
+        sign_bgr = cv2.warpAffine(
+            sign_bgr, matrix, (sign_w, sign_h), borderMode=cv2.BORDER_REPLICATE
+        )
+
+    top = (height - sign_h) // 2
+    left = (width - sign_w) // 2
+    facade[top : top + sign_h, left : left + sign_w] = sign_bgr
+    img = facade.astype(np.float32)
+
+    if shadow:
+        # Тень по горизонтали: левый край темнее правого
+        ramp = np.linspace(1.0 - shadow, 1.0, width, dtype=np.float32)
+        img *= ramp[None, :, None]
+
+    if noise:
+        img += rng.normal(0, noise * 255, img.shape).astype(np.float32)
+
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+
+def make_dataset(count, font_path, seed=0, widths=(640, 1200, 2400)):
+    """
+    Генерирует (image, sample) с разными размерами, шумом, тенью и поворотом.
+    Параметры искажений детерминированы seed, чтобы прогоны были сравнимы.
+    """
+    rng = random.Random(seed)
+    for index, sample in enumerate(make_samples(count, seed)):
+        image = render_sign(
+            sample,
+            font_path,
+            width=rng.choice(widths),
+            noise=rng.choice([0.0, 0.03, 0.08]),
+            shadow=rng.choice([0.0, 0.4, 0.7]),
+            angle=rng.uniform(-6, 6),
+            seed=seed + index,
+        )
+        yield image, sample
@@ -37,6 +37,93 @@ class Config:
         "adjust_contrast": 0.8,  # Усиливаем контраст
     }
 
+    # Инференс на CPU (при OCR_GPU = False)
+    OCR_CPU_THREADS = None  # Потоков torch внутри операции (None - по ядрам)
+    OCR_CPU_INTEROP_THREADS = None  # Потоков между операциями
+
+    # Адаптивный масштаб детектора (ocr/adaptive_scale.py): грубый проход
+    # на уменьшенном кадре, затем точный только по областям с текстом.
+    # canvas_size и mag_ratio из OCR_PARAMS становятся верхней границей
+    OCR_ADAPTIVE_SCALE = False
+    OCR_COARSE_SIZE = 1024  # Длинная сторона кадра в грубом проходе
+    OCR_TARGET_TEXT_HEIGHT = 40  # Высота строки (px) для точного прохода
+    OCR_REGION_MARGIN = 1.0  # Поля вокруг строки, в долях её высоты
+
+    # Распознавание только внутри найденной синей таблички (ocr/plate_locator.py).
+    # Если табличка не найдена или в ней нет текста - обрабатывается весь кадр
+    OCR_PLATE_CROP = False
+    PLATE_SEARCH_SIZE = 640  # Длинная сторона уменьшенной копии для поиска
+    PLATE_HSV_LOWER = (95, 80, 40)  # Синий фон таблички в HSV OpenCV (H 0..180)
+    PLATE_HSV_UPPER = (130, 255, 255)
+    PLATE_MIN_AREA = 0.005  # Минимальная доля площади кадра
+    PLATE_MIN_ASPECT = 1.2  # Ширина / высота
+    PLATE_MAX_ASPECT = 8.0
+    PLATE_MARGIN = 0.05  # Поля вокруг таблички, в долях её размера
+    PLATE_MAX_CANDIDATES = 2
+
+    # Порядок выполнения двух OCR-проходов (оригинал + предобработка):
+    # "sequential" - строго по очереди;
+    # "parallel"   - предобработка одновременно с первым проходом,
+    #                оба распознавания выполняются параллельно;
+    # "adaptive"   - второй проход пропускается, если первый уже уверенный
+    OCR_EXECUTION_MODE = "sequential"
+    OCR_ADAPTIVE_CONFIDENCE = 0.8  # Порог уверенности для режима "adaptive"
+
+    # Детекция текста (CRAFT) выполняется один раз на оригинале, а для
+    # предобработанного изображения повторяется только распознавание
+    OCR_SHARED_DETECTION = True
+
+    # Общий батч распознавания для одновременных запросов (сервис, пакетная
+    # обработка в потоках): области текста от разных изображений собираются
+    # и прогоняются через сеть одной пачкой
+    OCR_MICRO_BATCHING = False
+    OCR_BATCH_MAX_SIZE = 32  # Областей в одной пачке
+    OCR_BATCH_MAX_WAIT_MS = 10  # Максимальная добавленная задержка
+
+    # Минимальный IoU, при котором области двух проходов считаются одной
+    # (слияние без общей детекции, см. ocr/box_merge.py)
+    OCR_MERGE_IOU = 0.5
+
+    # Цепочка предобработки для второго прохода OCR (порядок важен).
+    # Стадии: resize, grayscale, clahe, sauvola, niblack, adaptive_threshold,
+    # otsu, nlmeans, bilateral, median (параметры - см. ocr/stages.py).
+    # Стадию можно выключить, добавив "enabled": False.
+    PREPROCESS_PIPELINE = [
+        {"stage": "resize", "min_width": 800},  # Увеличиваем маленькие фото
+        {"stage": "grayscale"},
+        {"stage": "clahe", "clip_limit": 2.0, "tile_grid_size": (8, 8)},
+        # window_size=25, k=0.2 дают хорошие результаты для документов
+        {"stage": "sauvola", "window_size": 25, "k": 0.2},
+        {"stage": "nlmeans", "h": 5},  # h поменьше, чтобы не размыть буквы
+    ]
+
+    # Полосовая многопоточная предобработка (локальные стадии цепочки)
+    PREPROCESS_WORKERS = None  # None = по числу ядер CPU, 1 = без полос
+    PREPROCESS_MIN_STRIP_ROWS = 128  # Полосы ниже не имеют смысла из-за перекрытия
+
+    # Асинхронный интерфейс для сервисов (ocr/async_engine.py)
+    ASYNC_MAX_CONCURRENCY = 1  # Одновременных распознаваний (потоков пула)
+    ASYNC_QUEUE_DEPTH = 8  # Сколько запросов может ждать сверх этого
+
+    # Минимальная уверенность OCR, с которой текст передаётся в парсер
+    OCR_MIN_CONFIDENCE = 0.3
+    # Минимальная уверенность, с которой рамка текста показывается на фото
+    # (по умолчанию; в интерфейсе меняется ползунком)
+    BOX_MIN_CONFIDENCE = 0.3
+
+    # Справочник улиц для исправления опечаток в названии (parser/gazetteer.py):
+    # папка индекса (python -m parser.gazetteer streets.csv -o streets.idx)
+    # или CSV/текстовый файл с названиями. None - без исправления
+    GAZETTEER_PATH = None
+    GAZETTEER_MAX_DISTANCE = 2  # Максимум правок (для коротких слов меньше)
+
+    # Пакетная (headless) обработка, см. batch.py
+    BATCH_WORKERS = None  # None = по числу ядер CPU
+    BATCH_THREADS_PER_WORKER = 1  # Потоков torch/OpenCV на один процесс
+    # Загрузить модель один раз в родительском процессе и раздать воркерам
+    # через fork (copy-on-write). Там, где fork нет, воркеры грузят модель сами
+    BATCH_SHARE_MODEL = True
+
     # Настройки шрифтов
     FONTS = {
         "header": ("Segoe UI", 14, "bold"),
@@ -48,3 +135,9 @@ class Config:
     # Пути
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
     ASSETS_DIR = os.path.join(BASE_DIR, "assets")
+
+    # Кэш результатов (OCR + разбор адреса) по содержимому изображения
+    CACHE_ENABLED = True
+    CACHE_DIR = os.path.join(BASE_DIR, ".cache", "results")
+    CACHE_MEMORY_ITEMS = 256  # Записей в памяти процесса
+    CACHE_MAX_DISK_MB = 512  # Лимит на диске (0 - только в памяти)
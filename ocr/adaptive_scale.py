@@ -0,0 +1,100 @@
+"""
+Выбор масштаба детектора CRAFT по размеру изображения и высоте текста.
+
+Время детекции растёт квадратично от размера холста, а фиксированные
+canvas_size/mag_ratio увеличивают весь кадр, даже если текст занимает его
+малую часть. Поэтому сначала идёт грубый проход на уменьшенном кадре,
+а затем точный - только по областям, где нашёлся текст, и с увеличением,
+подобранным по высоте найденных строк.
+"""
+
+import math
+import statistics
+
+
+def box_rect(box, horizontal):
+    """(x0, y0, x1, y1, высота строки) для bbox детектора."""
+    if horizontal:
+        x_min, x_max, y_min, y_max = box
+        return x_min, y_min, x_max, y_max, y_max - y_min
+
+    xs = [x for x, _ in box]
+    ys = [y for _, y in box]
+    # Наклонная строка: высота - меньшая из сторон четырёхугольника
+    side_a = math.dist(box[0], box[1])
+    side_b = math.dist(box[1], box[2])
+    return min(xs), min(ys), max(xs), max(ys), min(side_a, side_b)
+
+
+def text_regions(boxes, shape, margin):
+    """
+    Группирует bbox в непересекающиеся прямоугольные области с полями
+    margin * высота строки. Возвращает список словарей:
+    rect - (x0, y0, x1, y1) в пикселях изображения,
+    height - медианная высота строк в области,
+    horizontal/free - bbox, попавшие в область.
+    """
+    height_limit, width_limit = shape[:2]
+    regions = []
+    horizontal_list, free_list = boxes
+    for horizontal, items in ((True, horizontal_list), (False, free_list)):
+        for box in items:
+            x0, y0, x1, y1, line_height = box_rect(box, horizontal)
+            pad = margin * line_height
+            regions.append(
+                {
+                    "rect": [
+                        max(0, int(x0 - pad)),
+                        max(0, int(y0 - pad)),
+                        min(width_limit, int(math.ceil(x1 + pad))),
+                        min(height_limit, int(math.ceil(y1 + pad))),
+                    ],
+                    "heights": [line_height],
+                    "horizontal": [box] if horizontal else [],
+                    "free": [] if horizontal else [box],
+                }
+            )
+
+    # Сливаем пересекающиеся области, пока есть что сливать.
+    # Строк на табличке десятки, поэтому квадратичный проход не страшен
+    merged = True
+    while merged:
+        merged = False
+        result = []
+        for region in regions:
+            for other in result:
+                if _overlaps(region["rect"], other["rect"]):
+                    rect, other_rect = region["rect"], other["rect"]
+                    other["rect"] = [
+                        min(rect[0], other_rect[0]),
+                        min(rect[1], other_rect[1]),
+                        max(rect[2], other_rect[2]),
+                        max(rect[3], other_rect[3]),
+                    ]
+                    for key in ("heights", "horizontal", "free"):
+                        other[key].extend(region[key])
+                    merged = True
+                    break
+            else:
+                result.append(region)
+        regions = result
+
+    for region in regions:
+        region["rect"] = tuple(region["rect"])
+        region["height"] = statistics.median(region.pop("heights"))
+    return regions
+
+
+def _overlaps(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def offset_boxes(boxes, dx, dy):
+    """Переносит bbox из координат вырезанной области в координаты кадра."""
+    horizontal_list, free_list = boxes
+    horizontal_list = [
+        [x_min + dx, x_max + dx, y_min + dy, y_max + dy]
+        for x_min, x_max, y_min, y_max in horizontal_list
+    ]
+    free_list = [[[x + dx, y + dy] for x, y in box] for box in free_list]
+    return horizontal_list, free_list
@@ -0,0 +1,123 @@
+import asyncio
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+from ocr.engine import OCREngine
+
+
+class EngineBusyError(Exception):
+    """Очередь запросов заполнена и место не освободилось за отведённое время."""
+
+
+class AsyncOCREngine:
+    """
+    asyncio-интерфейс к OCREngine для встраивания в асинхронные сервисы.
+
+    Распознавание выполняется в собственном пуле из max_concurrency потоков,
+    поэтому всплеск запросов не порождает новых потоков. Ещё не более
+    queue_depth запросов ждут своей очереди в пуле; остальные корутины
+    ждут места (backpressure) или, при заданном timeout, получают
+    EngineBusyError - например, чтобы HTTP-сервис ответил 429/503.
+    """
+
+    def __init__(self, engine=None, max_concurrency=None, queue_depth=None):
+        if engine is None:
+            engine = OCREngine(languages=Config.OCR_LANGUAGES, gpu=Config.OCR_GPU)
+        self.engine = engine
+        self.max_concurrency = max_concurrency or Config.ASYNC_MAX_CONCURRENCY
+        self.queue_depth = (
+            Config.ASYNC_QUEUE_DEPTH if queue_depth is None else queue_depth
+        )
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency, thread_name_prefix="ocr-async"
+        )
+        # Запросы в работе плюс ожидающие в пуле
+        self._slots = asyncio.Semaphore(self.max_concurrency + self.queue_depth)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def wait_until_loaded(self, timeout=None):
+        """Асинхронно ждёт загрузки модели (вместо опроса is_loaded)."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.engine.wait_until_loaded, timeout)
+
+    async def process(self, image, timeout=None):
+        """
+        Распознаёт image (путь, bytes или numpy array) и возвращает
+        список (bbox, text, prob), как OCREngine.process_image.
+        timeout - сколько секунд ждать места в очереди (None - без ограничения,
+        0 - отказать сразу, если очередь заполнена).
+        """
+        await self._acquire(timeout)
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor, self.engine.process_image, image
+            )
+        finally:
+            self._slots.release()
+
+    async def process_stream(self, images, return_exceptions=False):
+        """
+        Асинхронный генератор по потоку изображений (обычный или async
+        итерируемый объект). Результаты отдаются в порядке входа; новые
+        изображения берутся из потока, только когда есть место в очереди,
+        поэтому медленный потребитель притормаживает и источник.
+        При return_exceptions=True ошибка отдаётся вместо результата.
+        """
+        limit = self.max_concurrency + self.queue_depth
+        pending = collections.deque()
+
+        async def next_result():
+            task = pending.popleft()
+            try:
+                return await task
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                return e
+
+        try:
+            async for image in _aiter(images):
+                if len(pending) >= limit:
+                    yield await next_result()
+                pending.append(asyncio.ensure_future(self.process(image)))
+
+            while pending:
+                yield await next_result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _acquire(self, timeout):
+        if timeout is None:
+            await self._slots.acquire()
+            return
+        if timeout <= 0:
+            # wait_for с нулевым таймаутом отменил бы даже свободный acquire
+            if self._slots.locked():
+                raise EngineBusyError("OCR queue is full")
+            await self._slots.acquire()
+            return
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout)
+        except asyncio.TimeoutError:
+            raise EngineBusyError("OCR queue is full")
+
+
+async def _aiter(items):
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
@@ -0,0 +1,252 @@
+import contextlib
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from config import Config
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+CSV_FIELDS = [
+    "path",
+    "street_type",
+    "street_name",
+    "house_number",
+    "raw",
+    "error",
+    "seconds",
+]
+
+# Конвейер конкретного процесса-воркера (у каждого свой прогретый easyocr.Reader)
+_worker_pipeline = None
+_worker_error = None
+
+# Движок, загруженный в родительском процессе до fork (см. BatchProcessor.run)
+_shared_engine = None
+
+
+def collect_images(source):
+    """
+    Возвращает список путей к изображениям.
+    source - папка (обходится рекурсивно) или манифест:
+    текстовый файл с одним путём на строку (пустые строки и '#' пропускаются,
+    относительные пути считаются от папки манифеста).
+    """
+    if os.path.isdir(source):
+        paths = []
+        for root, _, files in os.walk(source):
+            for name in files:
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    paths.append(os.path.join(root, name))
+        return sorted(paths)
+
+    base_dir = os.path.dirname(os.path.abspath(source))
+    paths = []
+    with open(source, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if not os.path.isabs(line):
+                line = os.path.join(base_dir, line)
+            paths.append(line)
+    return paths
+
+
+def _init_worker(threads):
+    """
+    Инициализация процесса-воркера: ограничиваем число потоков,
+    чтобы N процессов не дрались за ядра, и загружаем модель один раз.
+    """
+    global _worker_pipeline, _worker_error
+
+    # Результаты пишет только родительский процесс; отладочный вывод
+    # воркеров не должен попадать в stdout вперемешку с JSONL
+    sys.stdout = sys.stderr
+
+    import cv2
+
+    from ocr.engine import OCREngine
+    from ocr.pipeline import AddressPipeline
+
+    cv2.setNumThreads(threads)
+    Config.PREPROCESS_WORKERS = threads
+    # Параллелизм даёт число процессов; межоперационный пул torch не нужен
+    Config.OCR_CPU_THREADS = threads
+    Config.OCR_CPU_INTEROP_THREADS = 1
+    OCREngine.configure_cpu(threads, 1)
+
+    try:
+        if _shared_engine is not None:
+            # Модель унаследована от родителя: её страницы общие, пока их
+            # никто не меняет. Поток батчера распознавания fork не переживает,
+            # да и воркер обрабатывает по одному изображению
+            _shared_engine.batcher = None
+            pipeline = AddressPipeline(engine=_shared_engine)
+        else:
+            pipeline = AddressPipeline()
+            pipeline.engine.wait_until_loaded()
+        _worker_pipeline = pipeline
+    except Exception as e:
+        # Исключение в initializer заставило бы Pool бесконечно
+        # перезапускать воркеры, поэтому отдаём ошибку в каждой записи
+        _worker_error = str(e)
+
+
+def _process_one(path):
+    record = {
+        "path": path,
+        "street_type": "",
+        "street_name": "",
+        "house_number": "",
+        "raw": "",
+        "texts": [],
+        "error": None,
+    }
+    start = time.perf_counter()
+
+    try:
+        if _worker_pipeline is None:
+            raise Exception(_worker_error or "OCR worker is not initialized")
+
+        ocr_results, parsed_address = _worker_pipeline.run(path)
+        record.update(parsed_address)
+        record["texts"] = [
+            {
+                "bbox": [[float(x), float(y)] for x, y in bbox],
+                "text": text,
+                "prob": float(prob),
+            }
+            for bbox, text, prob in ocr_results
+        ]
+    except Exception as e:
+        record["error"] = str(e)
+
+    record["seconds"] = round(time.perf_counter() - start, 3)
+    return record
+
+
+class BatchProcessor:
+    """
+    Раздаёт изображения пулу процессов. Каждый процесс держит прогретый
+    OCR-движок (при Config.BATCH_SHARE_MODEL - общий, загруженный до fork),
+    результаты отдаются по мере готовности.
+    """
+
+    def __init__(self, workers=None, threads_per_worker=None):
+        self.workers = workers or Config.BATCH_WORKERS or os.cpu_count() or 1
+        self.threads_per_worker = threads_per_worker or Config.BATCH_THREADS_PER_WORKER
+
+    def run(self, paths):
+        """Генератор записей-результатов в порядке завершения обработки."""
+        global _shared_engine
+
+        context = multiprocessing.get_context()
+        if (
+            Config.BATCH_SHARE_MODEL
+            and "fork" in multiprocessing.get_all_start_methods()
+        ):
+            context = multiprocessing.get_context("fork")
+            _shared_engine = self._load_shared_engine()
+
+        try:
+            yield from self._run_pool(context, paths)
+        finally:
+            _shared_engine = None
+
+    def _run_pool(self, context, paths):
+        with context.Pool(
+            processes=self.workers,
+            initializer=_init_worker,
+            initargs=(self.threads_per_worker,),
+        ) as pool:
+            # chunksize=1: фото обрабатываются секунды, балансировка важнее накладных расходов
+            for record in pool.imap_unordered(_process_one, paths, chunksize=1):
+                yield record
+
+    @staticmethod
+    def _load_shared_engine():
+        """
+        Загружает модель в родительском процессе, чтобы воркеры получили её
+        через fork вместо N отдельных загрузок и N копий весов.
+        Родитель сам не распознаёт, поэтому torch здесь работает в один поток:
+        пул потоков OpenMP, запущенный до fork, в дочерних процессах зависает.
+        """
+        from ocr.engine import OCREngine
+
+        saved = Config.OCR_CPU_THREADS, Config.OCR_CPU_INTEROP_THREADS
+        Config.OCR_CPU_THREADS = Config.OCR_CPU_INTEROP_THREADS = 1
+        # stdout родителя занят результатами (JSONL/CSV)
+        try:
+            with contextlib.redirect_stdout(sys.stderr):
+                engine = OCREngine(languages=Config.OCR_LANGUAGES, gpu=Config.OCR_GPU)
+                engine.wait_until_loaded()
+        except Exception:
+            # Воркеры попробуют загрузить модель сами и сообщат ошибку
+            return None
+        finally:
+            Config.OCR_CPU_THREADS, Config.OCR_CPU_INTEROP_THREADS = saved
+        return engine
+
+
+class JsonlWriter:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, record):
+        self.stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.stream.flush()
+
+
+class CsvWriter:
+    def __init__(self, stream):
+        self.stream = stream
+        self.writer = csv.DictWriter(
+            stream, fieldnames=CSV_FIELDS, extrasaction="ignore"
+        )
+        self.writer.writeheader()
+
+    def write(self, record):
+        self.writer.writerow(record)
+        self.stream.flush()
+
+
+WRITERS = {"jsonl": JsonlWriter, "csv": CsvWriter}
+
+
+def run_batch(source, output=None, fmt=None, workers=None, threads_per_worker=None):
+    """
+    Обрабатывает все изображения из source и пишет результаты
+    в output (или stdout) построчно, по мере готовности.
+    Возвращает число изображений, обработанных с ошибкой.
+    """
+    paths = collect_images(source)
+
+    if fmt is None:
+        fmt = "csv" if output and output.lower().endswith(".csv") else "jsonl"
+
+    stream = open(output, "w", encoding="utf-8", newline="") if output else sys.stdout
+    writer = WRITERS[fmt](stream)
+    processor = BatchProcessor(workers, threads_per_worker)
+
+    errors = 0
+    start = time.perf_counter()
+    try:
+        for done, record in enumerate(processor.run(paths), start=1):
+            writer.write(record)
+            if record["error"]:
+                errors += 1
+            elapsed = time.perf_counter() - start
+            print(
+                f"[{done}/{len(paths)}] {record['path']} "
+                f"({done / elapsed:.2f} img/s)",
+                file=sys.stderr,
+            )
+    finally:
+        if output:
+            stream.close()
+
+    return errors
@@ -0,0 +1,99 @@
+"""
+Геометрическое слияние результатов двух проходов OCR.
+
+Области сопоставляются по IoU описанных прямоугольников, а кандидаты для
+сравнения берутся из равномерной сетки (пространственный индекс), поэтому
+на сотнях bbox время почти линейное, а не квадратичное.
+"""
+
+import statistics
+from collections import defaultdict
+
+
+def bbox_rect(bbox):
+    """Описанный прямоугольник (x0, y0, x1, y1) для bbox из 4 точек."""
+    xs = [float(x) for x, _ in bbox]
+    ys = [float(y) for _, y in bbox]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def iou(a, b):
+    width = min(a[2], b[2]) - max(a[0], b[0])
+    height = min(a[3], b[3]) - max(a[1], b[1])
+    if width <= 0 or height <= 0:
+        return 0.0
+    intersection = width * height
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+class GridIndex:
+    """Равномерная сетка: прямоугольник регистрируется во всех своих ячейках."""
+
+    def __init__(self, rects):
+        self.rects = rects
+        sizes = [max(r[2] - r[0], r[3] - r[1]) for r in rects]
+        # Ячейка порядка типичного bbox: каждый попадает в 1-4 ячейки
+        self.cell = max(statistics.median(sizes) if sizes else 1.0, 1.0)
+        self.cells = defaultdict(list)
+        for index, rect in enumerate(rects):
+            for key in self._keys(rect):
+                self.cells[key].append(index)
+
+    def _keys(self, rect):
+        cell = self.cell
+        for cx in range(int(rect[0] // cell), int(rect[2] // cell) + 1):
+            for cy in range(int(rect[1] // cell), int(rect[3] // cell) + 1):
+                yield cx, cy
+
+    def candidates(self, rect):
+        found = set()
+        for key in self._keys(rect):
+            found.update(self.cells.get(key, ()))
+        return found
+
+
+def merge_by_iou(primary, secondary, threshold=0.5):
+    """
+    Объединяет результаты (bbox, text, prob) двух проходов в одних координатах.
+    Область из secondary, перекрывающаяся с областью primary по IoU не меньше
+    threshold (или пересекающаяся с тем же текстом), может только заменить
+    её текст, если уверенность выше; bbox остаётся от primary.
+    Несопоставленные области обоих проходов сохраняются.
+    Пустые тексты отбрасываются.
+    """
+    primary = [item for item in primary if item[1].strip()]
+    secondary = [item for item in secondary if item[1].strip()]
+
+    best = list(primary)
+    rects = [bbox_rect(bbox) for bbox, _, _ in primary]
+    index = GridIndex(rects)
+    extra = []
+
+    for bbox, text, prob in secondary:
+        rect = bbox_rect(bbox)
+        match, match_iou = None, threshold
+        same_text = None
+        # При равном IoU побеждает область, идущая раньше в primary
+        for candidate in sorted(index.candidates(rect)):
+            overlap = iou(rect, rects[candidate])
+            if overlap > match_iou or (match is None and overlap == match_iou):
+                match, match_iou = candidate, overlap
+            elif (
+                same_text is None
+                and overlap > 0
+                and primary[candidate][1].strip().lower() == text.strip().lower()
+            ):
+                same_text = candidate
+
+        # Тот же текст на пересекающемся месте - та же надпись, даже если
+        # детектор очертил её иначе; иначе в адрес попали бы повторы
+        if match is None:
+            match = same_text
+
+        if match is None:
+            extra.append((bbox, text, prob))
+        elif prob > best[match][2]:
+            best[match] = (best[match][0], text, prob)
+
+    return best + extra
@@ -0,0 +1,213 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from ocr.image_io import read_image_buffer
+
+# Доля лимита диска, после записи которой процесс пересканирует папку кэша
+RESCAN_FRACTION = 0.05
+
+
+def content_hash(source):
+    """
+    Хэш содержимого изображения.
+    Для файла, bytes и закодированного буфера хэшируются байты файла
+    (декодировать не нужно), для декодированного массива - пиксели и форма.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+
+    if isinstance(source, np.ndarray):
+        if source.ndim != 1:
+            digest.update(repr((source.shape, source.dtype.str)).encode())
+        digest.update(np.ascontiguousarray(source).data)
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+    else:
+        digest.update(read_image_buffer(os.fspath(source)).data)
+
+    return digest.hexdigest()
+
+
+def _serialize_ocr(ocr_results):
+    return [
+        [[[float(x), float(y)] for x, y in bbox], text, float(prob)]
+        for bbox, text, prob in ocr_results
+    ]
+
+
+def _deserialize_ocr(data):
+    return [(bbox, text, prob) for bbox, text, prob in data]
+
+
+class ResultCache:
+    """
+    Двухуровневый LRU-кэш результатов: в памяти и на диске.
+    Ключ - хэш содержимого изображения плюс отпечаток настроек
+    (fingerprint), поэтому смена параметров OCR не отдаёт устаревшие данные.
+    Значение - сырые результаты OCR (bbox, text, prob) и разобранный адрес.
+    """
+
+    def __init__(self, directory, fingerprint, memory_items=256, max_disk_bytes=0):
+        self.directory = directory
+        self.fingerprint = fingerprint
+        self.memory_items = memory_items
+        self.max_disk_bytes = max_disk_bytes
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = None  # Считается лениво при первой записи
+        self._unscanned_bytes = 0  # Записано этим процессом с последнего скана
+
+    def make_key(self, source):
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(self.fingerprint.encode())
+        digest.update(content_hash(source).encode())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        # Раскладываем по подпапкам, чтобы не держать тысячи файлов в одной
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def get(self, key):
+        """Возвращает (ocr_results, parsed_address) или None."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                ocr_results, parsed_address = self._memory[key]
+                return list(ocr_results), dict(parsed_address)
+
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            # Обновляем mtime: по нему вытесняются давно не использованные записи
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+
+        ocr_results = _deserialize_ocr(data["ocr"])
+        parsed_address = data["address"]
+        self._remember(key, ocr_results, parsed_address)
+        return list(ocr_results), dict(parsed_address)
+
+    def put(self, key, ocr_results, parsed_address):
+        ocr_results = _deserialize_ocr(_serialize_ocr(ocr_results))
+        self._remember(key, ocr_results, dict(parsed_address))
+
+        if self.max_disk_bytes:
+            # Результат уже получен: проблемы дискового кэша не должны
+            # превращать его в ошибку распознавания
+            try:
+                self._write(key, ocr_results, parsed_address)
+            except OSError as e:
+                print(f"Cannot update result cache: {e}")
+
+    def _remember(self, key, ocr_results, parsed_address):
+        with self._lock:
+            self._memory[key] = (ocr_results, parsed_address)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def _write(self, key, ocr_results, parsed_address):
+        path = self._path(key)
+        payload = json.dumps(
+            {"ocr": _serialize_ocr(ocr_results), "address": parsed_address},
+            ensure_ascii=False,
+        ).encode("utf-8")
+
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Атомарная запись: кэш могут одновременно писать процессы batch-режима
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Cannot write result cache: {e}")
+            return
+
+        # В одну папку пишут и другие процессы (batch.py), а счётчик видит
+        # только свои записи. Поэтому папка пересканируется перед решением
+        # о вытеснении и после каждых RESCAN_FRACTION лимита своих записей:
+        # превышение лимита ограничено долей RESCAN_FRACTION на процесс
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += len(payload)
+                self._unscanned_bytes += len(payload)
+            need_scan = (
+                self._disk_bytes is None
+                or self._disk_bytes > self.max_disk_bytes
+                or self._unscanned_bytes >= self.max_disk_bytes * RESCAN_FRACTION
+            )
+
+        if need_scan:
+            entries = self._scan()
+            total = sum(size for _, _, size in entries)
+            with self._lock:
+                self._disk_bytes = total
+                self._unscanned_bytes = 0
+            if total > self.max_disk_bytes:
+                self._evict(entries)
+
+    def _scan(self):
+        """Список (mtime, path, size) всех записей на диске."""
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for sub in os.scandir(self.directory):
+            if not sub.is_dir():
+                continue
+            try:
+                children = list(os.scandir(sub.path))
+            except OSError:
+                continue
+            for entry in children:
+                if not entry.name.endswith(".json"):
+                    continue
+                # Файл мог удалить другой процесс, вытесняющий записи
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, entry.path, stat.st_size))
+        return entries
+
+    def _evict(self, entries=None):
+        """
+        Удаляет самые давно использованные файлы, пока кэш не станет
+        меньше 90% лимита (запас, чтобы не сканировать папку на каждой записи).
+        """
+        entries = sorted(self._scan() if entries is None else entries)
+        total = sum(size for _, _, size in entries)
+        target = self.max_disk_bytes * 0.9
+
+        for _, path, size in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # Уже удалён другим процессом
+            except OSError:
+                continue
+            total -= size
+
+        with self._lock:
+            self._disk_bytes = total
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        for _, path, _ in self._scan():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        with self._lock:
+            self._disk_bytes = 0
+            self._unscanned_bytes = 0
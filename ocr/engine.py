@@ -1,34 +1,112 @@
-import easyocr
+import math
 import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import easyocr
+import numpy as np
+import torch
+
+from ocr.adaptive_scale import offset_boxes, text_regions
+from ocr.box_merge import merge_by_iou
+from ocr.image_io import load_image, to_grayscale, to_rgb
+from ocr.plate_locator import PlateLocator
 from ocr.preprocessor import ImagePreprocessor
+from ocr.recognition_batcher import RecognitionBatcher
 from config import Config
 
+# Ключи Config.OCR_PARAMS, относящиеся к детектору CRAFT (Reader.detect).
+# Остальные параметры передаются в распознавание (Reader.recognize).
+DETECTION_PARAM_KEYS = {
+    "min_size",
+    "text_threshold",
+    "low_text",
+    "link_threshold",
+    "canvas_size",
+    "mag_ratio",
+    "slope_ths",
+    "ycenter_ths",
+    "height_ths",
+    "width_ths",
+    "add_margin",
+    "threshold",
+    "bbox_min_score",
+    "bbox_min_size",
+    "max_candidates",
+}
+
 
 class OCREngine:
     def __init__(self, languages=["ru", "en"], gpu=False):
         self.languages = languages
         self.gpu = gpu
         self.reader = None
+        self.batcher = None
         self.is_loaded = False
         self.load_error = None
 
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
         # Инициализация в отдельном потоке, чтобы не блокировать UI
         self._load_thread = threading.Thread(target=self._load_model, daemon=True)
         self._load_thread.start()
 
+    @staticmethod
+    def configure_cpu(threads=None, interop_threads=None):
+        """
+        Число потоков torch для инференса на CPU: threads - внутри одной
+        операции (свёртки, матричные умножения), interop_threads - между
+        независимыми операциями. None оставляет значение torch по умолчанию.
+        Межоперационный пул настраивается только до первого инференса.
+        """
+        if threads:
+            torch.set_num_threads(threads)
+        if interop_threads:
+            try:
+                torch.set_num_interop_threads(interop_threads)
+            except RuntimeError:
+                # Пул уже запущен в этом процессе - оставляем как есть
+                pass
+
     def _load_model(self):
         try:
+            if not self.gpu:
+                self.configure_cpu(
+                    Config.OCR_CPU_THREADS, Config.OCR_CPU_INTEROP_THREADS
+                )
             self.reader = easyocr.Reader(self.languages, gpu=self.gpu)
+            if Config.OCR_MICRO_BATCHING:
+                self.batcher = RecognitionBatcher(
+                    self.reader,
+                    max_batch_size=Config.OCR_BATCH_MAX_SIZE,
+                    max_wait_ms=Config.OCR_BATCH_MAX_WAIT_MS,
+                )
             self.is_loaded = True
         except Exception as e:
             self.load_error = str(e)
             print(f"Error loading OCR model: {e}")
 
-    def process_image(self, image_path):
+    def wait_until_loaded(self, timeout=None):
+        """
+        Блокирует текущий поток до окончания загрузки модели.
+        Нужен для headless-режима, где нет UI-цикла с опросом is_loaded.
+        """
+        self._load_thread.join(timeout)
+
+        if self.load_error:
+            raise Exception(f"Model failed to load: {self.load_error}")
+        if not self.is_loaded:
+            raise Exception("Model is still loading...")
+
+    def process_image(self, image, on_partial=None):
         """
         Запускает процесс распознавания.
+        image - путь, bytes или numpy array (см. ocr.image_io.load_image).
+        Изображение декодируется один раз и переиспользуется обоими проходами.
         Возвращает список кортежей (bbox, text, prob).
         Использует технику слияния результатов (оригинал + предобработка).
+        on_partial(results) вызывается в том же потоке с результатами первого
+        прохода, как только они готовы, - до второго прохода и слияния.
         """
         if not self.is_loaded:
             if self.load_error:
@@ -36,52 +114,299 @@ class OCREngine:
             raise Exception("Model is still loading...")
 
         try:
-            # 1. OCR на оригинале
-            result_original = self.reader.readtext(image_path, **Config.OCR_PARAMS)
+            if self.batcher is None:
+                return self._process(image, on_partial)
+            with self.batcher.request():
+                return self._process(image, on_partial)
+        except Exception as e:
+            raise Exception(f"OCR processing error: {e}")
 
-            # 2. OCR на предобработанном изображении
-            preprocessed_img = ImagePreprocessor.process(image_path)
+    def _process(self, image, on_partial=None):
+        img = load_image(image)
+        if img is None:
+            raise Exception("Cannot read image")
 
-            if preprocessed_img is not None:
-                result_preprocessed = self.reader.readtext(
-                    preprocessed_img, **Config.OCR_PARAMS
-                )
-                # Объединяем результаты
-                return self._merge_results(result_original, result_preprocessed)
-            else:
-                return result_original
+        if Config.OCR_PLATE_CROP:
+            results = self._process_plates(img, on_partial)
+            if results:
+                return results
+        return self._process_frame(img, on_partial)
 
-        except Exception as e:
-            raise Exception(f"OCR processing error: {e}")
+    def _process_plates(self, img, on_partial=None):
+        """
+        Распознаёт только найденные таблички (оба прохода работают с малой
+        частью пикселей) и переносит bbox в координаты всего кадра.
+        Пустой результат - повод обработать кадр целиком.
+        """
+        results = []
+        for x0, y0, x1, y1 in PlateLocator.locate(img):
+            plate_partial = None
+            if on_partial is not None:
+                # Промежуточный результат: готовые таблички + первый проход текущей
+                def plate_partial(partial, ready=list(results), dx=x0, dy=y0):
+                    on_partial(ready + self._offset_results(partial, dx, dy))
 
-    def _merge_results(self, result_original, result_preprocessed):
+            frame_results = self._process_frame(img[y0:y1, x0:x1], plate_partial)
+            results.extend(self._offset_results(frame_results, x0, y0))
+        return results
+
+    @staticmethod
+    def _offset_results(results, dx, dy):
+        return [
+            ([[x + dx, y + dy] for x, y in bbox], text, prob)
+            for bbox, text, prob in results
+        ]
+
+    def _process_frame(self, img, on_partial=None):
+        mode = Config.OCR_EXECUTION_MODE
+        if mode == "sequential":
+            result_original, result_preprocessed = self._run_sequential(img, on_partial)
+        elif mode == "parallel":
+            result_original, result_preprocessed = self._run_parallel(img, on_partial)
+        elif mode == "adaptive":
+            result_original, result_preprocessed = self._run_adaptive(img, on_partial)
+        else:
+            raise Exception(f"Unknown OCR execution mode: {mode}")
+
+        if result_preprocessed is None:
+            return result_original
+
+        # Объединяем результаты
+        if Config.OCR_SHARED_DETECTION and len(result_original) == len(
+            result_preprocessed
+        ):
+            return self._merge_aligned(result_original, result_preprocessed)
+        return self._merge_results(result_original, result_preprocessed)
+
+    def _detect_boxes(self, img):
         """
-        Объединяет результаты от двух OCR-проходов.
-        bbox берётся ТОЛЬКО от оригинального изображения (правильные координаты).
-        Тексты берутся лучшие по уверенности.
+        Детекция текста CRAFT один раз на оригинале.
+        Возвращает (horizontal_list, free_list) в координатах img
+        или None, если общая детекция выключена и каждый проход делает свою.
         """
-        best_results = {}
+        if not Config.OCR_SHARED_DETECTION:
+            return None
+        return self._detect(img)
 
-        # Сначала добавляем результаты от оригинала
-        for bbox, text, prob in result_original:
-            normalized = text.strip().lower()
-            if not normalized:
-                continue
-            best_results[normalized] = (bbox, text, prob)
+    def _detect(self, img):
+        params = {
+            key: value
+            for key, value in Config.OCR_PARAMS.items()
+            if key in DETECTION_PARAM_KEYS
+        }
+        if Config.OCR_ADAPTIVE_SCALE:
+            return self._detect_adaptive(to_rgb(img), params)
+
+        horizontal_list, free_list = self.reader.detect(
+            to_rgb(img), reformat=False, **params
+        )
+        # detect работает с пачкой изображений, у нас одно
+        return horizontal_list[0], free_list[0]
+
+    def _detect_at(self, rgb, params, scale):
+        """Детекция с увеличением scale (холст подгоняется, чтобы не обрезать)."""
+        params = dict(params)
+        params["mag_ratio"] = scale
+        params["canvas_size"] = int(math.ceil(max(rgb.shape[:2]) * scale)) + 32
+        horizontal_list, free_list = self.reader.detect(
+            np.ascontiguousarray(rgb), reformat=False, **params
+        )
+        return horizontal_list[0], free_list[0]
+
+    def _detect_adaptive(self, rgb, params):
+        """
+        Грубый проход на кадре, уменьшенном до OCR_COARSE_SIZE, затем точный
+        по каждой области с текстом - с увеличением, при котором строки
+        становятся высотой OCR_TARGET_TEXT_HEIGHT (но не больше, чем дали бы
+        canvas_size/mag_ratio из OCR_PARAMS). Если грубый проход ничего
+        не нашёл, кадр целиком проходит обычную детекцию.
+        """
+        longest = max(rgb.shape[:2])
+        max_scale = min(
+            params.get("mag_ratio", 1.0), params.get("canvas_size", 2560) / longest
+        )
+        coarse_scale = min(Config.OCR_COARSE_SIZE / longest, max_scale)
 
-        # Добавляем тексты от предобработанного, если они лучше
-        for bbox_prep, text, prob in result_preprocessed:
-            normalized = text.strip().lower()
-            if not normalized:
+        coarse_boxes = self._detect_at(rgb, params, coarse_scale)
+        if not coarse_boxes[0] and not coarse_boxes[1]:
+            return self._detect_at(rgb, params, max_scale)
+
+        horizontal_list, free_list = [], []
+        regions = text_regions(coarse_boxes, rgb.shape, Config.OCR_REGION_MARGIN)
+        for region in regions:
+            scale = min(Config.OCR_TARGET_TEXT_HEIGHT / region["height"], max_scale)
+            if scale <= coarse_scale * 1.25:
+                # Текст и так крупный: грубого прохода достаточно
+                horizontal_list.extend(region["horizontal"])
+                free_list.extend(region["free"])
                 continue
 
-            if normalized in best_results:
-                old_prob = best_results[normalized][2]
-                if prob > old_prob:
-                    # Обновляем текст и prob, но оставляем bbox от оригинала
-                    old_bbox = best_results[normalized][0]
-                    best_results[normalized] = (old_bbox, text, prob)
-            # Если текста нет в оригинале, мы его НЕ добавляем,
-            # так как у нас нет правильного bbox для оригинала (масштабы могут отличаться)
+            x0, y0, x1, y1 = region["rect"]
+            boxes = self._detect_at(rgb[y0:y1, x0:x1], params, scale)
+            boxes = offset_boxes(boxes, x0, y0)
+            horizontal_list.extend(boxes[0])
+            free_list.extend(boxes[1])
+
+        return horizontal_list, free_list
+
+    def _recognize_pass(self, img, boxes, scale=1.0):
+        """
+        Один проход распознавания. Если boxes переданы, детектор не
+        запускается: распознаются только готовые области, пересчитанные
+        в масштаб img (предобработка может увеличить изображение).
+        scale - во сколько раз img больше оригинала; bbox результата
+        возвращаются в координатах оригинала.
+        """
+        if img is None:
+            return None
+
+        if boxes is not None:
+            results = self._recognize(img, self._scale_boxes(boxes, scale))
+        else:
+            # Не reader.readtext(img): массив он отдаёт детектору как есть,
+            # а CRAFT ждёт RGB (так он читает файл), у нас же BGR.
+            # _detect переводит в RGB, _recognize - в оттенки серого из BGR
+            results = self._recognize(img, self._detect(img))
+
+        if scale == 1.0:
+            return results
+        return [
+            ([[x / scale, y / scale] for x, y in bbox], text, prob)
+            for bbox, text, prob in results
+        ]
+
+    def _recognize(self, img, boxes):
+        params = {
+            key: value
+            for key, value in Config.OCR_PARAMS.items()
+            if key not in DETECTION_PARAM_KEYS
+        }
+        horizontal_list, free_list = boxes
+        if self.batcher is not None:
+            return self.batcher.recognize(
+                to_grayscale(img), horizontal_list, free_list, **params
+            )
+        return self.reader.recognize(
+            to_grayscale(img), horizontal_list, free_list, reformat=False, **params
+        )
+
+    @staticmethod
+    def _scale_boxes(boxes, scale):
+        horizontal_list, free_list = boxes
+        if scale == 1.0:
+            return horizontal_list, free_list
+
+        # horizontal_list: [x_min, x_max, y_min, y_max], free_list: 4 точки [x, y]
+        horizontal_list = [
+            [int(round(value * scale)) for value in box] for box in horizontal_list
+        ]
+        free_list = [[[x * scale, y * scale] for x, y in box] for box in free_list]
+        return horizontal_list, free_list
+
+    def _get_executor(self):
+        # Пул создаётся лениво: в режиме "sequential" он не нужен
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=2, thread_name_prefix="ocr-pass"
+                )
+            return self._executor
+
+    @staticmethod
+    def _emit_partial(on_partial, results):
+        if on_partial is not None and results is not None:
+            # Пустые тексты слияние всё равно отбросит
+            on_partial([item for item in results if item[1].strip()])
+
+    def _run_sequential(self, img, on_partial=None):
+        # 1. OCR на оригинале
+        boxes = self._detect_boxes(img)
+        result_original = self._recognize_pass(img, boxes)
+        self._emit_partial(on_partial, result_original)
+
+        # 2. OCR на предобработанном изображении
+        preprocessed_img, scale = ImagePreprocessor.process_with_scale(img)
+        return result_original, self._recognize_pass(preprocessed_img, boxes, scale)
+
+    def _run_parallel(self, img, on_partial=None):
+        """
+        Предобработка идёт одновременно с первым проходом, а второй проход
+        стартует сразу по её готовности. torch и OpenCV отпускают GIL,
+        поэтому потоки действительно работают параллельно.
+        """
+        executor = self._get_executor()
+        preprocess_future = executor.submit(ImagePreprocessor.process_with_scale, img)
+
+        boxes = self._detect_boxes(img)
+        original_future = executor.submit(self._recognize_pass, img, boxes)
+
+        # Промежуточный результат отдаётся, как только готов первый проход,
+        # а второй стартует, как только готова предобработка - что бы из
+        # них ни закончилось раньше
+        wait([original_future, preprocess_future], return_when=FIRST_COMPLETED)
+        preprocessed_future = None
+        if preprocess_future.done():
+            preprocessed_img, scale = preprocess_future.result()
+            preprocessed_future = executor.submit(
+                self._recognize_pass, preprocessed_img, boxes, scale
+            )
+
+        result_original = original_future.result()
+        self._emit_partial(on_partial, result_original)
+
+        if preprocessed_future is not None:
+            return result_original, preprocessed_future.result()
+        preprocessed_img, scale = preprocess_future.result()
+        return result_original, self._recognize_pass(preprocessed_img, boxes, scale)
+
+    def _run_adaptive(self, img, on_partial=None):
+        """
+        Второй проход выполняется, только если первый недостаточно уверен.
+        Предобработка (самая дорогая часть, NL-means) тоже запускается
+        только тогда: уже начатую задачу пула отменить нельзя, поэтому
+        заранее запущенная предобработка съедала бы выигрыш на уверенных
+        изображениях.
+        """
+        boxes = self._detect_boxes(img)
+        result_original = self._recognize_pass(img, boxes)
+        if self._is_confident(result_original):
+            return result_original, None
+
+        self._emit_partial(on_partial, result_original)
+        preprocessed_img, scale = ImagePreprocessor.process_with_scale(img)
+        return result_original, self._recognize_pass(preprocessed_img, boxes, scale)
+
+    @staticmethod
+    def _is_confident(results):
+        """
+        Проход считается уверенным, если найден хотя бы один значимый текст
+        и все значимые тексты (те, что уйдут в парсер) выше порога.
+        """
+        probs = [prob for _, _, prob in results if prob > Config.OCR_MIN_CONFIDENCE]
+        return bool(probs) and min(probs) >= Config.OCR_ADAPTIVE_CONFIDENCE
 
-        return list(best_results.values())
+    def _merge_aligned(self, result_original, result_preprocessed):
+        """
+        Объединяет проходы, распознававшие одни и те же области детектора:
+        i-й результат обоих проходов относится к одному bbox.
+        bbox берётся от оригинала, текст - с большей уверенностью.
+        """
+        merged = []
+        for original, preprocessed in zip(result_original, result_preprocessed):
+            bbox, text, prob = original
+            if preprocessed[2] > prob and preprocessed[1].strip():
+                text, prob = preprocessed[1], preprocessed[2]
+            if not text.strip():
+                continue
+            merged.append((bbox, text, prob))
+        return merged
+
+    def _merge_results(self, result_original, result_preprocessed):
+        """
+        Объединяет результаты от двух OCR-проходов по геометрии
+        (оба уже в координатах оригинала, см. _recognize_pass).
+        Совпавшие по IoU области получают текст с большей уверенностью
+        и bbox от оригинала; области, найденные только одним проходом,
+        сохраняются.
+        """
+        return merge_by_iou(result_original, result_preprocessed, Config.OCR_MERGE_IOU)
@@ -0,0 +1,62 @@
+import os
+
+import cv2
+import numpy as np
+
+
+def read_image_buffer(path):
+    """
+    Отображает файл в память (memory-map) как 1-D массив байт.
+    Файл не копируется целиком в кучу Python, а буфер можно сразу
+    передать в cv2.imdecode.
+    """
+    if os.path.getsize(path) == 0:
+        return np.empty(0, dtype=np.uint8)
+    return np.memmap(path, dtype=np.uint8, mode="r")
+
+
+def decode_image(buffer):
+    """Декодирует закодированный (jpg/png/...) буфер в BGR-массив."""
+    if buffer.size == 0:
+        return None
+    return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+
+def load_image(source):
+    """
+    Приводит вход к декодированному изображению (numpy array, BGR как у cv2.imread).
+    Поддерживаемые входы:
+    - путь к файлу (str / os.PathLike);
+    - bytes / bytearray / memoryview с содержимым файла;
+    - 1-D uint8 массив с закодированным файлом (например, из read_image_buffer);
+    - уже декодированный массив (H, W), (H, W, 3) или (H, W, 4) - возвращается без копирования.
+    Возвращает None, если изображение не удалось прочитать.
+    """
+    if isinstance(source, np.ndarray):
+        if source.ndim == 1:
+            return decode_image(source)
+        if source.ndim == 3 and source.shape[2] == 4:
+            return cv2.cvtColor(source, cv2.COLOR_BGRA2BGR)
+        return source
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return decode_image(np.frombuffer(source, dtype=np.uint8))
+
+    path = os.fspath(source)
+    if not os.path.isfile(path):
+        return None
+    return decode_image(read_image_buffer(path))
+
+
+def to_grayscale(img):
+    """BGR -> оттенки серого; одноканальное изображение возвращается как есть."""
+    if img.ndim == 2:
+        return img
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+
+def to_rgb(img):
+    """BGR или оттенки серого -> RGB (формат, который детектор получает из файла)."""
+    if img.ndim == 2:
+        return cv2.cvtColor(img, cv2.COLOR_GRAY2RGB)
+    return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
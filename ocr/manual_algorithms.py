@@ -14,7 +14,9 @@ class ManualBinarization:
         return cv2.integral(img).astype(np.float64)
 
     @staticmethod
-    def niblack_sauvola_formula(img, window_size=25, k=0.34, r=128, method="sauvola"):
+    def niblack_sauvola_formula(
+        img, window_size=25, k=0.34, r=128, method="sauvola", strip_rows=512
+    ):
         """
         Ручная реализация алгоритмов адаптивной бинаризации.
         Поддерживает Niblack и Sauvola.
@@ -24,91 +26,100 @@ class ManualBinarization:
         window_size - размер окна (нечетное число)
         k - коэффициент чувствительности (обычно 0.2 - 0.5)
         r - динамический диапазон стандартного отклонения (обычно 128)
+        strip_rows - высота полосы, которой обрабатывается изображение
+                     (ограничивает пиковую память; None - всё изображение сразу)
         """
         # Проверки входных данных
         if len(img.shape) > 2:
             img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
 
+        if method not in ("sauvola", "niblack"):
+            raise ValueError(f"Unknown binarization method: {method}")
+
         rows, cols = img.shape
         pad = window_size // 2
 
-        # 1. Считаем интегральные изображения для I и I^2
-        # Это нужно для быстрого расчета среднего и дисперсии
-        # Пэддинг изображения для обработки краев
+        # Пэддинг изображения для обработки краев (uint8, дёшево)
         padded_img = cv2.copyMakeBorder(img, pad, pad, pad, pad, cv2.BORDER_REFLECT)
 
-        integral_sum = cv2.integral(padded_img).astype(np.float64)
-        integral_sq_sum = cv2.integral(padded_img**2).astype(np.float64)
+        binarized = np.empty(img.shape, dtype=np.uint8)
+        strip_rows = strip_rows or rows
+
+        # Полосы независимы: каждой нужны только свои строки + окно.
+        # Временные массивы имеют размер полосы, а не всего изображения.
+        for top in range(0, rows, strip_rows):
+            bottom = min(top + strip_rows, rows)
+            ManualBinarization._binarize_strip(
+                padded_img[top : bottom + window_size - 1],
+                img[top:bottom],
+                binarized[top:bottom],
+                window_size,
+                k,
+                r,
+                method,
+            )
 
-        # Размеры интегральных изображений на 1 больше, чем padded_img
-        # Нам нужно вырезать правильные области, соответствующие окнам вокруг каждого пикселя
+        return binarized
 
-        # Координаты углов окон для всех пикселей сразу (векторизация)
-        # x1, y1 - верхний левый угол окна
-        # x2, y2 - нижний правый угол окна
+    @staticmethod
+    def _binarize_strip(padded_strip, img_strip, out, w, k, r, method):
+        """
+        Бинаризует одну полосу и пишет результат в out.
+        padded_strip - строки паддированного изображения, покрывающие окна полосы.
+        """
+        rows, cols = img_strip.shape
 
-        # Т.к. мы сделали паддинг 'pad', то для пикселя (0,0) исходного изображения
-        # в padded изображении координаты (pad, pad).
-        # Окно вокруг него будет от (0, 0) до (2*pad, 2*pad).
+        # 1. Интегральные изображения для I и I^2 за один вызов.
+        # Сумма uint8 в окне помещается в int32 точно, сумма квадратов -
+        # в float64 (целые до 2^53 представимы без потерь).
+        integral_sum, integral_sq_sum = cv2.integral2(
+            padded_strip, sdepth=cv2.CV_32S, sqdepth=cv2.CV_64F
+        )
 
-        # Сдвиги для получения сумм по окнам из интегрального изображения
-        # S(D) + S(A) - S(B) - S(C)
+        # Сумма в окне: S(D) + S(A) - S(B) - S(C), считаем на месте без
+        # промежуточных полноразмерных копий.
         # A=(y1, x1), B=(y1, x2), C=(y2, x1), D=(y2, x2)
-        # Но в integral() индексы сдвинуты на 1.
-        # Пусть Y, X - координаты в результирующей матрице (размером как исходная img)
-        # Окно размером w (window_size)
-
-        w = window_size
-
-        # Вырезаем нужные части интегральных матриц
-        # S_D: нижний правый угол окна
-        s_d = integral_sum[w : rows + w, w : cols + w]
-        # S_A: верхний левый угол
-        s_a = integral_sum[0:rows, 0:cols]
-        # S_B: верхний правый
-        s_b = integral_sum[0:rows, w : cols + w]
-        # S_C: нижний левый
-        s_c = integral_sum[w : rows + w, 0:cols]
-
-        # Сумма внутри окна для каждого пикселя
-        window_sum = s_d + s_a - s_b - s_c
-
-        # То же самое для квадратов
-        sq_d = integral_sq_sum[w : rows + w, w : cols + w]
-        sq_a = integral_sq_sum[0:rows, 0:cols]
-        sq_b = integral_sq_sum[0:rows, w : cols + w]
-        sq_c = integral_sq_sum[w : rows + w, 0:cols]
-
-        window_sq_sum = sq_d + sq_a - sq_b - sq_c
-
-        # 2. Считаем локальное среднее (Mean) и стандартное отклонение (Std)
-        # N = w * w
+        window_sum = integral_sum[w : rows + w, w : cols + w].copy()
+        window_sum -= integral_sum[0:rows, w : cols + w]
+        window_sum -= integral_sum[w : rows + w, 0:cols]
+        window_sum += integral_sum[0:rows, 0:cols]
+
+        window_sq_sum = integral_sq_sum[w : rows + w, w : cols + w].copy()
+        window_sq_sum -= integral_sq_sum[0:rows, w : cols + w]
+        window_sq_sum -= integral_sq_sum[w : rows + w, 0:cols]
+        window_sq_sum += integral_sq_sum[0:rows, 0:cols]
+        del integral_sum, integral_sq_sum
+
+        # 2. Локальное среднее (Mean) и стандартное отклонение (Std)
         n = w * w
+        mean = window_sum.astype(np.float32)
+        mean /= n
 
-        mean = window_sum / n
-
-        # Вар(X) = E[X^2] - (E[X])^2
-        variance = (window_sq_sum / n) - (mean**2)
+        # Вар(X) = E[X^2] - (E[X])^2; разность считаем в float64,
+        # иначе на ярких однородных областях теряется точность
+        window_sq_sum /= n
+        window_sq_sum -= np.square(mean, dtype=np.float64)
         # Из-за погрешности float может быть крошечный минус
-        variance[variance < 0] = 0
-        std = np.sqrt(variance)
-
-        # 3. Считаем порог T
-        threshold = np.zeros_like(mean)
+        np.maximum(window_sq_sum, 0, out=window_sq_sum)
+        std = np.sqrt(window_sq_sum, dtype=np.float32)
+        del window_sq_sum
 
+        # 3. Считаем порог T (в переменной std, на месте)
         if method == "sauvola":
             # T = m * (1 + k * (s/R - 1))
-            threshold = mean * (1 + k * ((std / r) - 1))
-        elif method == "niblack":
+            std *= k / r
+            std += 1 - k
+            std *= mean
+        else:
             # T = m + k * s
-            threshold = mean + k * std
+            std *= k
+            std += mean
+        threshold = std
 
         # 4. Бинаризация
         # Если пиксель > порога -> Белый (255), иначе Черный (0)
-        binarized = np.zeros_like(img)
-        binarized[img > threshold] = 255
-
-        return binarized
+        np.greater(img_strip, threshold, out=out.view(bool))
+        out *= 255
 
     @staticmethod
     def sauvola(img, window_size=25, k=0.34):
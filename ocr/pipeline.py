@@ -0,0 +1,126 @@
+import json
+
+import easyocr
+
+from config import Config
+from ocr.cache import ResultCache
+from ocr.engine import OCREngine
+from ocr.preprocessor import ImagePreprocessor
+from parser.address import AddressParser
+from parser.gazetteer import Gazetteer
+
+# Увеличивается при изменениях кода, влияющих на результат при тех же настройках
+CACHE_VERSION = 2
+
+
+def settings_fingerprint():
+    """Отпечаток всех настроек, от которых зависит результат распознавания."""
+    settings = {
+        "version": CACHE_VERSION,
+        "easyocr": getattr(easyocr, "__version__", ""),
+        "languages": Config.OCR_LANGUAGES,
+        "ocr_params": Config.OCR_PARAMS,
+        "adaptive_scale": [
+            Config.OCR_ADAPTIVE_SCALE,
+            Config.OCR_COARSE_SIZE,
+            Config.OCR_TARGET_TEXT_HEIGHT,
+            Config.OCR_REGION_MARGIN,
+        ],
+        "execution_mode": Config.OCR_EXECUTION_MODE,
+        "adaptive_confidence": Config.OCR_ADAPTIVE_CONFIDENCE,
+        "shared_detection": Config.OCR_SHARED_DETECTION,
+        "merge_iou": Config.OCR_MERGE_IOU,
+        "plate_crop": [
+            Config.OCR_PLATE_CROP,
+            Config.PLATE_SEARCH_SIZE,
+            Config.PLATE_HSV_LOWER,
+            Config.PLATE_HSV_UPPER,
+            Config.PLATE_MIN_AREA,
+            Config.PLATE_MIN_ASPECT,
+            Config.PLATE_MAX_ASPECT,
+            Config.PLATE_MARGIN,
+            Config.PLATE_MAX_CANDIDATES,
+        ],
+        "min_confidence": Config.OCR_MIN_CONFIDENCE,
+        "preprocessor": ImagePreprocessor.settings(),
+        "gazetteer": [
+            Config.GAZETTEER_PATH,
+            Gazetteer.signature(Config.GAZETTEER_PATH),
+        ],
+        "gazetteer_max_distance": Config.GAZETTEER_MAX_DISTANCE,
+    }
+    return json.dumps(settings, sort_keys=True, ensure_ascii=False)
+
+
+class AddressPipeline:
+    """
+    Полный цикл обработки одного изображения: OCR -> фильтрация -> разбор адреса.
+    Используется и в UI, и в пакетном режиме, чтобы логика не расходилась.
+    """
+
+    def __init__(self, engine=None, parser=None, cache=None):
+        if engine is None:
+            engine = OCREngine(languages=Config.OCR_LANGUAGES, gpu=Config.OCR_GPU)
+        self.engine = engine
+        self.parser = parser if parser is not None else AddressParser()
+
+        if cache is None and Config.CACHE_ENABLED:
+            cache = ResultCache(
+                Config.CACHE_DIR,
+                settings_fingerprint(),
+                memory_items=Config.CACHE_MEMORY_ITEMS,
+                max_disk_bytes=Config.CACHE_MAX_DISK_MB * 1024 * 1024,
+            )
+        self.cache = cache
+
+    @staticmethod
+    def texts_for_parser(ocr_results):
+        """Оставляет только тексты с достаточной уверенностью."""
+        return [
+            text
+            for (bbox, text, prob) in ocr_results
+            if prob > Config.OCR_MIN_CONFIDENCE
+        ]
+
+    def cache_key(self, source):
+        """
+        Ключ кэша для изображения (путь, bytes или массив).
+        Для файла дешевле посчитать ключ по пути, чем по декодированным пикселям.
+        """
+        if self.cache is None:
+            return None
+        return self.cache.make_key(source)
+
+    def run(self, image, cache_key=None, on_partial=None):
+        """
+        Возвращает кортеж (ocr_results, parsed_address).
+        ocr_results - список (bbox, text, prob) от OCREngine.
+        cache_key можно посчитать заранее через cache_key(), например по пути
+        к файлу, когда image - уже декодированный массив.
+        on_partial(ocr_results, parsed_address) получает предварительный
+        результат по первому проходу OCR, пока идёт второй (при попадании
+        в кэш не вызывается).
+        """
+        if self.cache is not None:
+            if cache_key is None:
+                cache_key = self.cache.make_key(image)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        partial_callback = None
+        if on_partial is not None:
+
+            def partial_callback(partial_results):
+                on_partial(
+                    partial_results,
+                    self.parser.parse(self.texts_for_parser(partial_results)),
+                )
+
+        ocr_results = self.engine.process_image(image, on_partial=partial_callback)
+        parsed_address = self.parser.parse(self.texts_for_parser(ocr_results))
+
+        if self.cache is not None:
+            self.cache.put(cache_key, ocr_results, parsed_address)
+
+        return ocr_results, parsed_address
@@ -0,0 +1,77 @@
+import cv2
+import numpy as np
+
+from config import Config
+
+
+class PlateLocator:
+    """
+    Быстрый поиск синей адресной таблички (московского образца) на фото
+    фасада: маска по цвету в HSV, морфологическое закрытие (белые буквы
+    внутри таблички), внешние контуры и фильтр по площади и пропорциям.
+    Работает на уменьшенной копии кадра, поэтому стоит миллисекунды.
+    """
+
+    @staticmethod
+    def locate(img):
+        """
+        Возвращает прямоугольники (x0, y0, x1, y1) кандидатов в координатах
+        img, от большего к меньшему. Пустой список - табличка не найдена.
+        """
+        if img is None or img.ndim != 3:
+            return []
+
+        height, width = img.shape[:2]
+        scale = min(1.0, Config.PLATE_SEARCH_SIZE / max(height, width))
+        small = img
+        if scale < 1.0:
+            small = cv2.resize(
+                img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA
+            )
+
+        # Шум на тёмных участках даёт случайный цветной "снег" в маске
+        small = cv2.GaussianBlur(small, (5, 5), 0)
+        hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+        mask = cv2.inRange(
+            hsv,
+            np.array(Config.PLATE_HSV_LOWER, dtype=np.uint8),
+            np.array(Config.PLATE_HSV_UPPER, dtype=np.uint8),
+        )
+
+        # Убираем оставшиеся точки, затем закрываем дыры от букв:
+        # ядро порядка толщины штриха крупного шрифта
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((3, 3), np.uint8))
+        kernel_size = max(3, int(max(small.shape[:2]) * 0.02) | 1)
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (kernel_size, kernel_size))
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        frame_area = small.shape[0] * small.shape[1]
+        candidates = []
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            area = w * h
+            if area < Config.PLATE_MIN_AREA * frame_area:
+                continue
+            if not Config.PLATE_MIN_ASPECT <= w / h <= Config.PLATE_MAX_ASPECT:
+                continue
+            # Табличка - сплошной прямоугольник, а не ветвистое пятно неба
+            if cv2.contourArea(contour) < 0.6 * area:
+                continue
+            candidates.append((area, x, y, w, h))
+
+        candidates.sort(reverse=True)
+        rects = []
+        for _, x, y, w, h in candidates[: Config.PLATE_MAX_CANDIDATES]:
+            pad_x = w * Config.PLATE_MARGIN
+            pad_y = h * Config.PLATE_MARGIN
+            rects.append(
+                (
+                    max(0, int((x - pad_x) / scale)),
+                    max(0, int((y - pad_y) / scale)),
+                    min(width, int(np.ceil((x + w + pad_x) / scale))),
+                    min(height, int(np.ceil((y + h + pad_y) / scale))),
+                )
+            )
+        return rects
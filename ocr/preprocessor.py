@@ -1,54 +1,197 @@
+import os
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
 import cv2
+import numpy as np
+
+from config import Config
+from ocr.image_io import load_image
+from ocr.stages import build_pipeline
+
+# Общий пул потоков для полосовой обработки (создаётся при первом использовании)
+_executor = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+
+
+def _get_executor(workers):
+    global _executor, _executor_workers
+
+    with _executor_lock:
+        if _executor is None or _executor_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="preprocess"
+            )
+            _executor_workers = workers
+        return _executor
 
 
 class ImagePreprocessor:
+    """
+    Предобработка изображения перед вторым проходом OCR.
+    Цепочка стадий задаётся в Config.PREPROCESS_PIPELINE (см. ocr.stages).
+    """
+
+    @staticmethod
+    def settings(pipeline=None):
+        """Параметры активных стадий (входят в отпечаток кэша результатов)."""
+        stages = build_pipeline(
+            Config.PREPROCESS_PIPELINE if pipeline is None else pipeline
+        )
+        return [stage.describe() for stage in stages]
+
     @staticmethod
-    def process(image_path):
+    def process(image, workers=None):
         """
         Предобработка изображения для улучшения качества OCR.
+        image - путь, bytes или уже декодированный numpy array.
+        workers - число потоков полосовой обработки
+                  (по умолчанию Config.PREPROCESS_WORKERS).
         Возвращает обработанное изображение (numpy array).
         """
-        # Читаем изображение
-        img = cv2.imread(image_path)
+        return ImagePreprocessor.process_with_scale(image, workers)[0]
 
-        if img is None:
-            return None
-
-        # 1. Увеличиваем изображение, если оно маленькое
-        height, width = img.shape[:2]
-        if width < 800:
-            scale = 800 / width
-            img = cv2.resize(
-                img, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC
-            )
+    @staticmethod
+    def process_with_scale(image, workers=None):
+        """
+        То же, что process, но возвращает кортеж (изображение, scale),
+        где scale - коэффициент увеличения относительно исходного изображения.
+        Нужен, чтобы переносить координаты между оригиналом и результатом.
+        """
+        result = ImagePreprocessor.run(image, workers=workers)
+        return result["image"], result["scale"]
 
-        # 2. Конвертируем в оттенки серого
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    @staticmethod
+    def run(image, pipeline=None, workers=None, trace_memory=False):
+        """
+        Прогоняет изображение через цепочку стадий и возвращает словарь:
+        image   - результат (None, если изображение не прочитано);
+        scale   - во сколько раз результат больше исходника;
+        seconds - общее время;
+        stages  - по записи на стадию: stage, seconds, output_bytes,
+                  tiled и (при trace_memory) peak_bytes.
 
-        # 3. Улучшаем контраст с помощью CLAHE
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        enhanced = clahe.apply(gray)
+        Подряд идущие локальные стадии (tileable) считаются полосами
+        с перекрытием в пуле потоков. Их seconds - суммарное время по
+        всем полосам, а peak_bytes - пик всей группы. Стадии, которые
+        OpenCV распараллеливает сам (threaded), идут целиком, пока у
+        OpenCV больше одного потока.
+        peak_bytes учитывает только аллокации NumPy (через tracemalloc).
+        """
+        started = time.perf_counter()
+        result = {"image": None, "scale": 1.0, "seconds": 0.0, "stages": []}
 
-        # 4. Бинаризация (выбор метода)
-        # 'sauvola' - наш ручной алгоритм (лучше для текста с тенями)
-        # 'standard' - стандартный OpenCV (быстрее, но хуже качество)
-        method = "sauvola"
+        img = load_image(image)
+        if img is None:
+            return result
 
-        if method == "sauvola":
-            from ocr.manual_algorithms import ManualBinarization
+        stages = build_pipeline(
+            Config.PREPROCESS_PIPELINE if pipeline is None else pipeline
+        )
+        source_width = img.shape[1]
 
-            # window_size=25, k=0.2 дают хорошие результаты для документов
-            binary = ManualBinarization.sauvola(enhanced, window_size=25, k=0.2)
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            stop_tracing = True
         else:
-            # Стандартный OpenCV подход
-            binary = cv2.adaptiveThreshold(
-                enhanced, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
-            )
+            stop_tracing = False
+
+        try:
+            for tiled, group in ImagePreprocessor._group_stages(stages):
+                if trace_memory:
+                    tracemalloc.reset_peak()
+                    memory_before = tracemalloc.get_traced_memory()[0]
+
+                if tiled:
+                    img, timings = ImagePreprocessor._run_tiled_group(
+                        img, group, workers
+                    )
+                else:
+                    stage_started = time.perf_counter()
+                    img = group[0].apply(img)
+                    timings = [time.perf_counter() - stage_started]
+
+                for stage, seconds in zip(group, timings):
+                    entry = {
+                        "stage": stage.name,
+                        "seconds": seconds,
+                        "output_bytes": img.nbytes,
+                        "tiled": tiled,
+                    }
+                    if trace_memory:
+                        peak = tracemalloc.get_traced_memory()[1]
+                        entry["peak_bytes"] = peak - memory_before
+                    result["stages"].append(entry)
+        finally:
+            if stop_tracing:
+                tracemalloc.stop()
+
+        result["image"] = img
+        result["scale"] = img.shape[1] / source_width
+        result["seconds"] = time.perf_counter() - started
+        return result
+
+    @staticmethod
+    def _group_stages(stages):
+        """
+        Разбивает цепочку на группы (tiled, [стадии]): каждая стадия,
+        которая идёт целиком, - отдельная группа, подряд идущие полосовые
+        стадии объединяются в одну.
+
+        Стадию с threaded OpenCV уже считает на cv2.getNumThreads()
+        потоках. Полосы поверх этого запускают workers x cv2-потоков на
+        тех же ядрах, поэтому такая стадия идёт целиком. Если потоки
+        OpenCV отключены (cv2.setNumThreads(1)), её снова режут на полосы.
+        """
+        cv2_threaded = cv2.getNumThreads() > 1
+        groups = []
+        for stage in stages:
+            tiled = stage.tileable and not (stage.threaded and cv2_threaded)
+            if tiled and groups and groups[-1][0]:
+                groups[-1][1].append(stage)
+            else:
+                groups.append((tiled, [stage]))
+        return groups
+
+    @staticmethod
+    def _apply_group(img, group):
+        timings = []
+        for stage in group:
+            stage_started = time.perf_counter()
+            img = stage.apply(img)
+            timings.append(time.perf_counter() - stage_started)
+        return img, timings
+
+    @staticmethod
+    def _run_tiled_group(img, group, workers=None):
+        """
+        Применяет группу локальных стадий к перекрывающимся горизонтальным
+        полосам img в пуле потоков и склеивает результат. Перекрытие равно
+        сумме радиусов стадий и отрезается, поэтому швов нет.
+        """
+        workers = workers or Config.PREPROCESS_WORKERS or os.cpu_count() or 1
+        rows = img.shape[0]
+        strip_rows = max(Config.PREPROCESS_MIN_STRIP_ROWS, -(-rows // workers))
+
+        if workers <= 1 or strip_rows >= rows:
+            return ImagePreprocessor._apply_group(img, group)
+
+        overlap = sum(stage.radius() for stage in group)
 
-        # 5. Убираем шум
-        # Для Сауволы шум обычно меньше, но почистить полезно
-        denoised = cv2.fastNlMeansDenoising(
-            binary, h=5
-        )  # h поменьше, чтобы не размыть буквы
+        def run_strip(top):
+            bottom = min(top + strip_rows, rows)
+            start = max(top - overlap, 0)
+            end = min(bottom + overlap, rows)
+            strip, timings = ImagePreprocessor._apply_group(img[start:end], group)
+            return strip[top - start : bottom - start], timings
 
-        return denoised
+        results = list(
+            _get_executor(workers).map(run_strip, range(0, rows, strip_rows))
+        )
+        timings = [sum(column) for column in zip(*(t for _, t in results))]
+        return np.concatenate([strip for strip, _ in results], axis=0), timings
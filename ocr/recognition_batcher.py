@@ -0,0 +1,205 @@
+import contextlib
+import threading
+import time
+from concurrent.futures import Future
+
+import easyocr
+from easyocr.recognition import get_text
+from easyocr.utils import get_image_list
+
+# Параметры Reader.recognize, которые поддерживает общий батч.
+# С остальными (paragraph, rotation_info, detail...) вызов идёт напрямую.
+BATCHABLE_PARAMS = {
+    "decoder",
+    "beamWidth",
+    "batch_size",
+    "workers",
+    "allowlist",
+    "blocklist",
+    "contrast_ths",
+    "adjust_contrast",
+    "filter_ths",
+}
+
+RECOGNIZE_DEFAULTS = {
+    "decoder": "greedy",
+    "beamWidth": 5,
+    "allowlist": None,
+    "blocklist": None,
+    "contrast_ths": 0.1,
+    "adjust_contrast": 0.5,
+    "filter_ths": 0.003,
+}
+
+
+class RecognitionBatcher:
+    """
+    Собирает области текста от одновременных запросов и распознаёт их
+    одним прогоном сети вместо отдельного маленького прогона на каждый bbox.
+
+    Запрос кладёт свои вырезанные области в общую очередь и ждёт результаты.
+    Фоновый поток забирает очередь, когда в ней max_batch_size областей,
+    когда все активные запросы (см. request()) уже сдали свои области,
+    или когда с первой области прошло max_wait_ms - это и есть предел
+    добавленной задержки.
+
+    Области группируются по ширине входа сети: в одну пачку попадают
+    только области с одинаковой шириной паддинга, поэтому результат
+    совпадает с тем, что дал бы Reader.recognize для каждой области отдельно.
+    """
+
+    def __init__(self, reader, max_batch_size=32, max_wait_ms=10):
+        self.reader = reader
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self._pending = []  # (ключ группы, (box, crop), future)
+        self._waiting = 0  # Запросов, сдавших области и ждущих ответа
+        self._active = 0  # Запросов внутри request()
+        self._first_at = None
+        self._condition = threading.Condition()
+
+        self._thread = threading.Thread(
+            target=self._run, name="ocr-batcher", daemon=True
+        )
+        self._thread.start()
+
+    @contextlib.contextmanager
+    def request(self):
+        """
+        Отмечает запрос как выполняющийся. Пока все активные запросы
+        не сдали области, батчер ждёт их (не дольше max_wait_ms);
+        одиночный запрос не ждёт совсем.
+        """
+        with self._condition:
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._active -= 1
+                self._condition.notify()
+
+    def recognize(self, img_cv_grey, horizontal_list, free_list, **params):
+        """
+        Аналог Reader.recognize(img_cv_grey, horizontal_list, free_list,
+        reformat=False, **params) с режимом по одной области (как на CPU).
+        """
+        if set(params) - BATCHABLE_PARAMS:
+            return self.reader.recognize(
+                img_cv_grey, horizontal_list, free_list, reformat=False, **params
+            )
+
+        settings = {**RECOGNIZE_DEFAULTS, **params}
+        settings.pop("batch_size", None)
+        settings.pop("workers", None)
+        ignore_char = self._ignore_char(
+            settings.pop("allowlist"), settings.pop("blocklist")
+        )
+        model_height = easyocr.easyocr.imgH
+
+        # Порядок как в Reader.recognize: сначала horizontal_list, затем free_list
+        items = []
+        for h_list, f_list in [([box], []) for box in horizontal_list] + [
+            ([], [box]) for box in free_list
+        ]:
+            image_list, max_width = get_image_list(
+                h_list, f_list, img_cv_grey, model_height=model_height
+            )
+            if image_list:
+                key = (int(max_width), ignore_char, tuple(sorted(settings.items())))
+                items.append((key, image_list[0], Future()))
+
+        if not items:
+            return []
+
+        with self._condition:
+            if self._first_at is None:
+                self._first_at = time.monotonic()
+            self._pending.extend(items)
+            self._waiting += 1
+            self._condition.notify()
+
+        try:
+            return [future.result() for _, _, future in items]
+        finally:
+            with self._condition:
+                self._waiting -= 1
+
+    def _ignore_char(self, allowlist, blocklist):
+        character = self.reader.character
+        if allowlist:
+            return "".join(set(character) - set(allowlist))
+        if blocklist:
+            return "".join(set(blocklist))
+        return "".join(set(character) - set(self.reader.lang_char))
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._ready():
+                    if self._pending:
+                        remaining = self._first_at + self.max_wait - time.monotonic()
+                        self._condition.wait(max(remaining, 0))
+                    else:
+                        self._condition.wait()
+                batch, self._pending, self._first_at = self._pending, [], None
+
+            try:
+                self._process(batch)
+            except Exception as e:
+                # Поток батчера один на все запросы: его падение повесило бы
+                # и текущие, и все будущие вызовы recognize
+                error = e
+            else:
+                error = Exception("Recognition returned fewer results than crops")
+            # Ни один future не должен остаться без ответа
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+
+    def _ready(self):
+        if not self._pending:
+            return False
+        return (
+            len(self._pending) >= self.max_batch_size
+            or self._waiting >= self._active
+            or time.monotonic() - self._first_at >= self.max_wait
+        )
+
+    def _process(self, batch):
+        groups = {}
+        for key, item, future in batch:
+            groups.setdefault(key, []).append((item, future))
+
+        reader = self.reader
+        for (width, ignore_char, settings), entries in groups.items():
+            settings = dict(settings)
+            for start in range(0, len(entries), self.max_batch_size):
+                chunk = entries[start : start + self.max_batch_size]
+                try:
+                    results = get_text(
+                        reader.character,
+                        easyocr.easyocr.imgH,
+                        width,
+                        reader.recognizer,
+                        reader.converter,
+                        [item for item, _ in chunk],
+                        ignore_char,
+                        settings["decoder"],
+                        settings["beamWidth"],
+                        len(chunk),
+                        settings["contrast_ths"],
+                        settings["adjust_contrast"],
+                        settings["filter_ths"],
+                        0,
+                        reader.device,
+                    )
+                except Exception as e:
+                    for _, future in chunk:
+                        future.set_exception(e)
+                    continue
+
+                # Недостающие результаты (если есть) получат ошибку в _run
+                for (_, future), result in zip(chunk, results):
+                    future.set_result(result)
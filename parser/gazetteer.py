@@ -0,0 +1,329 @@
+"""
+Справочник названий улиц для исправления опечаток OCR.
+
+    python -m parser.gazetteer streets.csv -o streets.idx
+
+Индекс - словарь удалений в духе SymSpell: для каждого названия хранятся
+хэши всех вариантов его начала (prefix_length символов) с удалёнными
+до max_distance символами. Запрос порождает такие же удаления, находит
+совпадающие хэши двоичным поиском и проверяет кандидатов настоящим
+расстоянием Дамерау-Левенштейна.
+
+Сохранённый индекс - папка с .npy-файлами, которые открываются через
+np.load(mmap_mode="r"): старт не зависит от размера справочника, а страницы
+подгружаются с диска по мере обращения.
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+from array import array
+from itertools import combinations
+
+import numpy as np
+
+INDEX_VERSION = 1
+
+# Колонки с названием улицы в CSV (первая найденная; иначе - первая колонка)
+NAME_COLUMNS = ["name", "street", "formalname", "offname"]
+
+
+def normalize_key(text):
+    """Ключ сравнения: регистр и "ё" не важны, пробелы схлопнуты."""
+    return " ".join(text.lower().replace("ё", "е").split())
+
+
+def _hash(text):
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def _deletes(key, max_distance, prefix_length):
+    """Все варианты начала key с удалёнными 0..max_distance символами."""
+    prefix = key[:prefix_length]
+    variants = {prefix}
+    for distance in range(1, min(max_distance, len(prefix)) + 1):
+        for removed in combinations(range(len(prefix)), distance):
+            variants.add("".join(ch for i, ch in enumerate(prefix) if i not in removed))
+    return variants
+
+
+def edit_distance(a, b, max_distance):
+    """
+    Расстояние Дамерау-Левенштейна (с перестановкой соседних символов).
+    Если оно больше max_distance, возвращает max_distance + 1.
+    Считается только полоса шириной max_distance вокруг диагонали.
+    """
+    too_far = max_distance + 1
+    if abs(len(a) - len(b)) > max_distance:
+        return too_far
+    if a == b:
+        return 0
+
+    width = len(b)
+    previous2 = None
+    previous = list(range(width + 1))
+    for i in range(1, len(a) + 1):
+        char = a[i - 1]
+        low = max(1, i - max_distance)
+        high = min(width, i + max_distance)
+        current = [too_far] * (width + 1)
+        row_min = too_far
+        if low == 1:
+            current[0] = row_min = i
+        for j in range(low, high + 1):
+            value = previous[j - 1] + (char != b[j - 1])
+            if previous[j] + 1 < value:
+                value = previous[j] + 1
+            if current[j - 1] + 1 < value:
+                value = current[j - 1] + 1
+            if (
+                previous2 is not None
+                and j > 1
+                and char == b[j - 2]
+                and a[i - 2] == b[j - 1]
+                and previous2[j - 2] + 1 < value
+            ):
+                value = previous2[j - 2] + 1
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > max_distance:
+            return too_far
+        previous2, previous = previous, current
+
+    return min(previous[width], too_far)
+
+
+def read_names(path):
+    """
+    Читает названия улиц из CSV (выгрузка ФИАС и т.п.) или текстового файла
+    (по названию на строку). Повторы и пустые строки отбрасываются.
+    """
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        if path.lower().endswith(".csv"):
+            sample = f.read(4096)
+            f.seek(0)
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+            reader = csv.reader(f, dialect)
+            header = next(reader, [])
+            lowered = [column.strip().lower() for column in header]
+            column = next(
+                (lowered.index(name) for name in NAME_COLUMNS if name in lowered),
+                None,
+            )
+            if column is None:
+                # Заголовка нет: первая строка - уже данные
+                rows = [header]
+                column = 0
+            else:
+                rows = []
+            rows = (row for chunk in (rows, reader) for row in chunk)
+            names = (row[column] for row in rows if len(row) > column)
+        else:
+            names = (line for line in f)
+
+        return list(dict.fromkeys(name.strip() for name in names if name.strip()))
+
+
+class Gazetteer:
+    """
+    Компактный индекс названий улиц с нечётким поиском.
+    hashes/ids - отсортированные хэши удалений и номера названий,
+    names/offsets - все названия одной строкой UTF-8 и границы в ней.
+    """
+
+    def __init__(
+        self, hashes, ids, names, offsets, max_distance, prefix_length, path=None
+    ):
+        self.hashes = hashes
+        self.ids = ids
+        self.names = names
+        self.offsets = offsets
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.path = path
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __reduce__(self):
+        # В дочерние процессы передаём путь, а не сами массивы
+        if self.path is not None:
+            return Gazetteer.open, (self.path,)
+        return super().__reduce__()
+
+    @classmethod
+    def build(cls, names, max_distance=2, prefix_length=7):
+        """Строит индекс в памяти из списка названий."""
+        names = list(dict.fromkeys(names))
+        hashes = array("Q")
+        ids = array("I")
+        for name_id, name in enumerate(names):
+            for variant in _deletes(normalize_key(name), max_distance, prefix_length):
+                hashes.append(_hash(variant))
+                ids.append(name_id)
+
+        hashes = np.frombuffer(hashes, dtype=np.uint64)
+        ids = np.frombuffer(ids, dtype=np.uint32)
+        order = np.argsort(hashes, kind="stable")
+
+        encoded = [name.encode("utf-8") for name in names]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+        np.cumsum([len(item) for item in encoded], out=offsets[1:])
+        blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+        return cls(
+            hashes[order], ids[order], blob, offsets, max_distance, prefix_length
+        )
+
+    @classmethod
+    def from_file(cls, path, max_distance=2, prefix_length=7):
+        return cls.build(read_names(path), max_distance, prefix_length)
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for field in ("hashes", "ids", "names", "offsets"):
+            np.save(os.path.join(directory, field + ".npy"), getattr(self, field))
+        meta = {
+            "version": INDEX_VERSION,
+            "count": len(self),
+            "max_distance": self.max_distance,
+            "prefix_length": self.prefix_length,
+        }
+        with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        self.path = directory
+
+    @classmethod
+    def load(cls, directory):
+        """Открывает сохранённый индекс без чтения в память (memory-mapped)."""
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported gazetteer index version in {directory}")
+
+        # np.asarray снимает обёртку memmap (она дорога при индексации),
+        # данные при этом остаются отображёнными с диска
+        arrays = {
+            field: np.asarray(
+                np.load(os.path.join(directory, field + ".npy"), mmap_mode="r")
+            )
+            for field in ("hashes", "ids", "names", "offsets")
+        }
+        return cls(
+            max_distance=meta["max_distance"],
+            prefix_length=meta["prefix_length"],
+            path=directory,
+            **arrays,
+        )
+
+    @staticmethod
+    def signature(path):
+        """
+        Отпечаток справочника для ключа кэша результатов: размеры и время
+        изменения его файлов (и meta.json индекса), чтобы пересборка индекса
+        на том же месте не отдавала разборы по старому справочнику.
+        """
+        if not path or not os.path.exists(path):
+            return None
+        if os.path.isdir(path):
+            files = ["meta.json"] + [
+                field + ".npy" for field in ("hashes", "ids", "names", "offsets")
+            ]
+            paths = [os.path.join(path, name) for name in files]
+        else:
+            paths = [path]
+
+        signature = []
+        for file_path in paths:
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                signature.append(None)
+                continue
+            signature.append([stat.st_size, stat.st_mtime_ns])
+        if os.path.isdir(path):
+            try:
+                with open(paths[0], encoding="utf-8") as f:
+                    signature.append(json.load(f))
+            except (OSError, ValueError):
+                signature.append(None)
+        return signature
+
+    @classmethod
+    def open(cls, path, max_distance=2):
+        """Папка - готовый индекс, файл - список названий (индекс строится)."""
+        if os.path.isdir(path):
+            return cls.load(path)
+        return cls.from_file(path, max_distance)
+
+    def name(self, name_id):
+        start, end = self.offsets[name_id], self.offsets[name_id + 1]
+        return bytes(self.names[start:end]).decode("utf-8")
+
+    def lookup(self, text, max_distance=None):
+        """
+        Ближайшее название к text: кортеж (name, distance) или None.
+        max_distance не может превышать значение, с которым построен индекс.
+        Короткие слова исправляются осторожнее: не больше len // 4 правок.
+        """
+        key = normalize_key(text)
+        if not key:
+            return None
+
+        limit = self.max_distance if max_distance is None else max_distance
+        limit = min(limit, self.max_distance, len(key) // 4)
+
+        variants = _deletes(key, limit, self.prefix_length)
+        query = np.fromiter((_hash(v) for v in variants), dtype=np.uint64)
+        left = np.searchsorted(self.hashes, query, side="left")
+        right = np.searchsorted(self.hashes, query, side="right")
+        candidates = np.unique(
+            np.concatenate(
+                [self.ids[start:end] for start, end in zip(left, right) if end > start]
+                or [np.empty(0, dtype=np.uint32)]
+            )
+        )
+
+        best = None
+        for name_id in candidates.tolist():
+            name = self.name(name_id)
+            # Граница сужается по мере нахождения лучших кандидатов
+            bound = limit if best is None else best[0]
+            distance = edit_distance(key, normalize_key(name), bound)
+            if distance > bound:
+                continue
+            candidate = (distance, abs(len(name) - len(text)), name_id, name)
+            if best is None or candidate < best:
+                best = candidate
+                if distance == 0:
+                    break
+
+        if best is None:
+            return None
+        return best[3], best[0]
+
+    def correct(self, text, max_distance=None):
+        """Название из справочника для text или сам text, если ничего не нашлось."""
+        match = self.lookup(text, max_distance)
+        return match[0] if match else text
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("source", help="CSV или текстовый файл с названиями")
+    arg_parser.add_argument("-o", "--output", required=True, help="Папка индекса")
+    arg_parser.add_argument("--max-distance", type=int, default=2)
+    arg_parser.add_argument("--prefix-length", type=int, default=7)
+    args = arg_parser.parse_args()
+
+    gazetteer = Gazetteer.from_file(args.source, args.max_distance, args.prefix_length)
+    gazetteer.save(args.output)
+    print(f"{len(gazetteer)} names -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
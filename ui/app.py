@@ -1,13 +1,25 @@
+import os
 import tkinter as tk
 from tkinter import filedialog, messagebox
-import threading
 
 from config import Config
 from ocr.engine import OCREngine
+from ocr.image_io import load_image
+from ocr.pipeline import AddressPipeline
 from parser.address import AddressParser
 from ui.styles import Styles
 from ui.components import ModernButton, ResultCard, StatusFooter
 from ui.image_viewer import ImageViewer
+from ui.job_queue import Job, JobQueue
+
+# Status mark and color of a queue item
+JOB_STYLES = {
+    Job.PENDING: ("…", "fg_secondary"),
+    Job.RUNNING: ("▶", "accent_hover"),
+    Job.DONE: ("✓", "success"),
+    Job.FAILED: ("✗", "error"),
+    Job.CANCELLED: ("—", "fg_secondary"),
+}
 
 
 class AddressApp:
@@ -24,6 +36,16 @@ class AddressApp:
         # Initialize core logic
         self.ocr_engine = OCREngine(languages=Config.OCR_LANGUAGES, gpu=Config.OCR_GPU)
         self.address_parser = AddressParser()
+        self.pipeline = AddressPipeline(self.ocr_engine, self.address_parser)
+        self.job_queue = JobQueue(self.pipeline, self.on_job_update)
+
+        # All submitted jobs, in the same order as the queue list
+        self.jobs = []
+        # First job of the current stack, for progress
+        self._batch_start = 0
+        # Job shown in the viewer and whether to switch to each new running job
+        self._shown_job = None
+        self._follow = True
 
         # UI Setup
         self.setup_ui()
@@ -94,6 +116,65 @@ class AddressApp:
         self.card_full = ResultCard(right_panel, "Полный адрес", "", icon="📝")
         self.card_full.pack(fill=tk.X, pady=5)
 
+        # Confidence filter for the boxes drawn over the photo
+        tk.Label(
+            right_panel,
+            text="Мин. уверенность рамок",
+            font=Config.FONTS["small"],
+            fg=Config.COLORS["fg_secondary"],
+            bg=Config.COLORS["bg_main"],
+        ).pack(anchor=tk.W, pady=(20, 0))
+
+        self.confidence_scale = tk.Scale(
+            right_panel,
+            from_=0.0,
+            to=1.0,
+            resolution=0.05,
+            orient=tk.HORIZONTAL,
+            command=self.on_confidence_change,
+            bg=Config.COLORS["bg_main"],
+            fg=Config.COLORS["fg_primary"],
+            troughcolor=Config.COLORS["bg_secondary"],
+            activebackground=Config.COLORS["accent"],
+            highlightthickness=0,
+            borderwidth=0,
+            font=Config.FONTS["small"],
+        )
+        self.confidence_scale.set(Config.BOX_MIN_CONFIDENCE)
+        self.confidence_scale.pack(fill=tk.X)
+
+        # Processing queue
+        queue_header = tk.Frame(right_panel, bg=Config.COLORS["bg_main"])
+        queue_header.pack(fill=tk.X, pady=(20, 5))
+
+        tk.Label(
+            queue_header,
+            text="Очередь",
+            font=("Arial", 12, "bold"),
+            fg=Config.COLORS["fg_secondary"],
+            bg=Config.COLORS["bg_main"],
+        ).pack(side=tk.LEFT)
+
+        self.btn_cancel = ModernButton(
+            queue_header, text="Отменить", command=self.cancel_jobs
+        )
+        self.btn_cancel.configure(pady=2, padx=10, font=Config.FONTS["small"])
+        self.btn_cancel.pack(side=tk.RIGHT)
+
+        self.job_list = tk.Listbox(
+            right_panel,
+            bg=Config.COLORS["bg_secondary"],
+            fg=Config.COLORS["fg_primary"],
+            selectbackground=Config.COLORS["accent"],
+            highlightthickness=0,
+            borderwidth=0,
+            activestyle="none",
+            selectmode=tk.EXTENDED,
+            font=Config.FONTS["small"],
+        )
+        self.job_list.pack(fill=tk.BOTH, expand=True)
+        self.job_list.bind("<<ListboxSelect>>", self.on_job_select)
+
         # --- Footer ---
         self.footer = StatusFooter(self.root)
         self.footer.pack(side=tk.BOTTOM, fill=tk.X)
@@ -114,56 +195,122 @@ class AddressApp:
             self.root.after(500, self.check_model_status)
 
     def load_image(self):
-        file_path = filedialog.askopenfilename(
+        file_paths = filedialog.askopenfilenames(
             filetypes=[("Images", "*.jpg *.jpeg *.png *.bmp")]
         )
-        if not file_path:
+        if not file_paths:
             return
 
-        # UI Updates
-        self.image_viewer.load_image(file_path)
-        self.footer.set_status("Распознавание...", is_loading=True)
-        self.btn_load.config(state=tk.DISABLED)
-
-        # Reset results
-        self.update_results({})
-
-        # Process in thread
-        threading.Thread(
-            target=self.process_image, args=(file_path,), daemon=True
-        ).start()
-
-    def process_image(self, file_path):
-        try:
-            results = self.ocr_engine.process_image(file_path)
-
-            # Extract text for parser
-            raw_texts = [text for (bbox, text, prob) in results if prob > 0.3]
-            parsed_address = self.address_parser.parse(raw_texts)
+        # A new stack after the previous one is done: restart progress
+        # and go back to showing each photo as it is processed
+        if all(job.finished for job in self.jobs):
+            self._batch_start = len(self.jobs)
+            self._follow = True
+
+        for job in self.job_queue.submit(file_paths):
+            self.jobs.append(job)
+            self.job_list.insert(tk.END, "")
+            self.refresh_job(len(self.jobs) - 1)
+
+        self.update_progress()
+
+    def cancel_jobs(self):
+        # Cancel the selected items, or everything still waiting
+        selected = [self.jobs[index] for index in self.job_list.curselection()]
+        self.job_queue.cancel(selected or self.jobs[self._batch_start :])
+
+    def on_job_update(self, job, image):
+        # Called from the worker threads: hand over to the main thread
+        self.root.after(0, lambda: self.apply_job_update(job, image))
+
+    def apply_job_update(self, job, image):
+        index = self.jobs.index(job)
+        self.refresh_job(index)
+        self.update_progress()
+
+        if image is not None and self._follow:
+            # The job has just started. Decode once: the same array
+            # is shown and passed to OCR
+            self.show_job(job, image)
+            self.job_list.selection_clear(0, tk.END)
+            self.job_list.selection_set(index)
+            self.job_list.see(index)
+        elif job is self._shown_job and (job.finished or job.provisional):
+            self.show_results(job)
+
+    def on_job_select(self, event):
+        selection = self.job_list.curselection()
+        if len(selection) != 1:
+            return
 
-            # Update UI in main thread
-            self.root.after(
-                0, lambda: self.on_process_complete(results, parsed_address)
+        job = self.jobs[selection[0]]
+        # Reviewing an earlier photo stops auto-switching to new ones
+        # until the running one is selected again
+        self._follow = job.status == Job.RUNNING
+        if job is not self._shown_job:
+            self.show_job(job)
+
+    def show_job(self, job, image=None):
+        if image is None:
+            image = load_image(job.path)
+            if image is None:
+                self.footer.set_status(f"Не удалось открыть файл: {job.path}")
+                return
+
+        self._shown_job = job
+        self.image_viewer.load_image(image)
+        self.show_results(job)
+
+    def show_results(self, job):
+        self.image_viewer.set_results(job.ocr_results)
+        self.update_results(job.parsed_address)
+
+        if job.status == Job.FAILED:
+            self.footer.set_status(f"Ошибка обработки: {job.error}")
+
+    def refresh_job(self, index):
+        job = self.jobs[index]
+        mark, color = JOB_STYLES[job.status]
+
+        text = f"{mark} {os.path.basename(job.path)}"
+        address = self.format_address(job.parsed_address)
+        if job.status == Job.DONE and address:
+            text += f" — {address}"
+        elif job.status == Job.RUNNING and job.provisional and address:
+            text += f" — {address}?"
+
+        # Listbox items can't be edited in place
+        selected = self.job_list.selection_includes(index)
+        self.job_list.delete(index)
+        self.job_list.insert(index, text)
+        self.job_list.itemconfig(index, fg=Config.COLORS[color])
+        if selected:
+            self.job_list.selection_set(index)
+
+    def update_progress(self):
+        batch = self.jobs[self._batch_start :]
+        done = sum(job.finished for job in batch)
+        failed = sum(job.status == Job.FAILED for job in batch)
+
+        if done < len(batch):
+            status = f"Распознавание: {done} из {len(batch)}"
+            shown = self._shown_job
+            if shown is not None and shown.status == Job.RUNNING and shown.provisional:
+                status += " (предварительный результат, уточняется)"
+            self.footer.set_status(
+                status,
+                is_loading=True,
+                progress=(done, len(batch)),
             )
+        else:
+            status = f"Распознавание завершено: {len(batch)} фото"
+            if failed:
+                status += f", ошибок: {failed}"
+            self.footer.set_status(status)
 
-        except Exception as e:
-            error_msg = str(e)
-            self.root.after(0, lambda msg=error_msg: self.on_process_error(msg))
-
-    def on_process_complete(self, ocr_results, parsed_address):
-        self.footer.set_status("Распознавание завершено")
-        self.btn_load.config(state=tk.NORMAL)
-
-        # Show boxes
-        self.image_viewer.set_results(ocr_results)
-
-        # Show text results
-        self.update_results(parsed_address)
-
-    def on_process_error(self, error_msg):
-        self.footer.set_status("Ошибка обработки")
-        self.btn_load.config(state=tk.NORMAL)
-        messagebox.showerror("Ошибка", f"Ошибка при распознавании:\n{error_msg}")
+    def on_confidence_change(self, value):
+        # Hides/shows existing boxes, nothing is redrawn
+        self.image_viewer.set_min_confidence(float(value))
 
     def update_results(self, data):
         # Update cards
@@ -188,6 +335,11 @@ class AddressApp:
         update_card(self.card_street, data.get("street_name", ""))
         update_card(self.card_number, data.get("house_number", ""))
 
+        full_text = self.format_address(data) or data.get("raw", "")
+        update_card(self.card_full, full_text)
+
+    @staticmethod
+    def format_address(data):
         full = []
         if data.get("street_type"):
             full.append(data.get("street_type"))
@@ -195,9 +347,7 @@ class AddressApp:
             full.append(data.get("street_name"))
         if data.get("house_number"):
             full.append(data.get("house_number"))
-
-        full_text = " ".join(full) if full else data.get("raw", "")
-        update_card(self.card_full, full_text)
+        return " ".join(full)
 
 
 if __name__ == "__main__":
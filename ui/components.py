@@ -136,11 +136,18 @@ class StatusFooter(tk.Frame):
 
         self.progress = ttk.Progressbar(self, mode="indeterminate")
 
-    def set_status(self, text, is_loading=False):
+    def set_status(self, text, is_loading=False, progress=None):
+        # progress: (done, total) for a determinate bar
         self.status_label.config(text=text)
         if is_loading:
             self.progress.pack(side=tk.RIGHT, padx=10, fill=tk.Y, pady=8)
-            self.progress.start(10)
+            if progress is None:
+                self.progress.config(mode="indeterminate")
+                self.progress.start(10)
+            else:
+                done, total = progress
+                self.progress.stop()
+                self.progress.config(mode="determinate", maximum=total, value=done)
         else:
             self.progress.stop()
             self.progress.pack_forget()
@@ -1,25 +1,66 @@
 import tkinter as tk
+from bisect import bisect_left
+from collections import OrderedDict
+
+import numpy as np
 from PIL import Image, ImageTk
 from config import Config
 
 
 class ImageViewer(tk.Canvas):
+    # Redraw at most once per frame while the window is being resized
+    RESIZE_INTERVAL_MS = 16
+    # Re-render with the high-quality filter once resizing has stopped
+    SETTLE_DELAY_MS = 200
+    # Smallest pyramid level; there is no point in going below a thumbnail
+    PYRAMID_MIN_SIZE = 256
+    # The viewport is rendered in square tiles of this many screen pixels
+    TILE_SIZE = 256
+    # Rendered tiles kept for panning back or returning to a seen zoom level
+    TILE_CACHE_SIZE = 128
+    ZOOM_STEP = 1.25
+    MAX_ZOOM = 8.0  # Screen pixels per image pixel
+
     def __init__(self, master, **kwargs):
         super().__init__(
             master, bg=Config.COLORS["bg_main"], highlightthickness=0, **kwargs
         )
 
         self.image = None  # Original PIL Image
-        self.tk_image = None  # PhotoImage for display
         self.scale = 1.0
         self.offset_x = 0
         self.offset_y = 0
 
+        # Downscaled copies of the image: level k is 2**k times smaller
+        self._pyramid = []
+        # Whole image fitted to the window (as opposed to user zoom)
+        self._fit = True
+        # LRU of rendered tiles: (scale, high_quality, tx, ty) -> PhotoImage
+        self._tiles = OrderedDict()
+        # Visible tiles: (tx, ty) -> (canvas item, PhotoImage)
+        self._tile_items = {}
+        # Canvas items per result: (prob, polygon, label), sorted by prob
+        self._overlays = []
+        self._overlay_probs = []
+        # (scale, offset_x, offset_y) the overlay items are currently drawn for
+        self._overlay_view = None
+        # Boxes below this confidence are hidden, not deleted
+        self.min_confidence = Config.BOX_MIN_CONFIDENCE
+        self._drag_from = None
+        self._resize_job = None
+        self._settle_job = None
+
         # Bounding boxes: list of (bbox, text)
         # bbox is usually [[x,y], [x,y]...] from EasyOCR
         self.ocr_results = []
 
         self.bind("<Configure>", self.on_resize)
+        self.bind("<ButtonPress-1>", self.on_drag_start)
+        self.bind("<B1-Motion>", self.on_drag)
+        self.bind("<Double-Button-1>", self.on_reset_zoom)
+        self.bind("<MouseWheel>", self.on_mouse_wheel)  # Windows, macOS
+        self.bind("<Button-4>", self.on_mouse_wheel)  # X11 scroll up
+        self.bind("<Button-5>", self.on_mouse_wheel)  # X11 scroll down
 
         # Placeholder text
         self.create_text(
@@ -32,43 +73,177 @@ class ImageViewer(tk.Canvas):
             tags="placeholder",
         )
 
-    def load_image(self, image_path):
-        self.image = Image.open(image_path)
-        self.ocr_results = []
+    def load_image(self, image):
+        # Accept an already decoded BGR array (shared with the OCR engine)
+        # so the photo isn't decoded a second time just for display
+        if isinstance(image, np.ndarray):
+            if image.ndim == 3:
+                image = image[:, :, ::-1]  # BGR -> RGB
+            self.image = Image.fromarray(np.ascontiguousarray(image))
+        else:
+            self.image = Image.open(image)
+        if self.image.mode not in ("RGB", "RGBA", "L"):
+            self.image = self.image.convert("RGB")
+
+        self._cancel_jobs()
+        self._pyramid = self._build_pyramid(self.image)
+        self._tiles.clear()
+        self._tile_items = {}
+        self.delete("tile")
+        self.delete("placeholder")
+
+        self._fit = True
         self.fit_image()
         self.redraw()
+        self.set_results([])
 
-    def fit_image(self):
-        if not self.image:
-            return
+    def _build_pyramid(self, image):
+        # Each level is a 2x box-filter reduction of the previous one,
+        # so the whole pyramid costs about a third of one full-size pass
+        levels = [image]
+        while max(levels[-1].size) > self.PYRAMID_MIN_SIZE * 2:
+            levels.append(levels[-1].reduce(2))
+        return levels
+
+    def _pyramid_level(self, width, height):
+        # Coarsest level that is still at least as large as the target,
+        # so we never upsample a preview and never touch more pixels than needed
+        for level in reversed(self._pyramid):
+            if level.width >= width and level.height >= height:
+                return level
+        return self._pyramid[0]
 
+    def _fit_scale(self):
         canvas_width = self.winfo_width()
         canvas_height = self.winfo_height()
 
         if canvas_width < 10 or canvas_height < 10:
-            return
+            return None
 
         img_w, img_h = self.image.size
         scale_w = canvas_width / img_w
         scale_h = canvas_height / img_h
 
-        self.scale = min(scale_w, scale_h) * 0.9  # 90% fit
+        return min(scale_w, scale_h) * 0.9  # 90% fit
 
-        # Center image
-        new_w = int(img_w * self.scale)
-        new_h = int(img_h * self.scale)
+    def fit_image(self):
+        if not self.image:
+            return
+
+        scale = self._fit_scale()
+        if scale is None:
+            return
+
+        self.scale = scale
+        self._clamp_offset()
 
-        self.offset_x = (canvas_width - new_w) // 2
-        self.offset_y = (canvas_height - new_h) // 2
+    def _display_size(self):
+        return (
+            max(1, round(self.image.width * self.scale)),
+            max(1, round(self.image.height * self.scale)),
+        )
+
+    def _clamp_offset(self):
+        # Center the image along an axis where it fits, otherwise
+        # don't let it be dragged away from the window edge
+        width, height = self._display_size()
+        canvas_width = self.winfo_width()
+        canvas_height = self.winfo_height()
+
+        if width <= canvas_width:
+            self.offset_x = (canvas_width - width) // 2
+        else:
+            self.offset_x = min(0, max(canvas_width - width, self.offset_x))
+
+        if height <= canvas_height:
+            self.offset_y = (canvas_height - height) // 2
+        else:
+            self.offset_y = min(0, max(canvas_height - height, self.offset_y))
 
     def set_results(self, results):
         self.ocr_results = results
-        self.redraw()
+
+        if not self.image:
+            return
+
+        # Bring existing items to the current view, then reuse them for the
+        # new results: only the difference in count is created or deleted
+        self._transform_overlays()
+        self._overlay_view = (self.scale, self.offset_x, self.offset_y)
+
+        overlays = []
+        for index, (bbox, text, prob) in enumerate(
+            sorted(results, key=lambda result: result[2])
+        ):
+            pts = []
+            for x, y in bbox:
+                screen_x = x * self.scale + self.offset_x
+                screen_y = y * self.scale + self.offset_y
+                pts.append(screen_x)
+                pts.append(screen_y)
+
+            state = tk.NORMAL if prob >= self.min_confidence else tk.HIDDEN
+
+            # Label sits above the first corner of the box
+            text_x = pts[0]
+            text_y = pts[1] - 20
+
+            if index < len(self._overlays):
+                _, polygon, label = self._overlays[index]
+                self.coords(polygon, *pts)
+                self.itemconfigure(polygon, state=state)
+                self.coords(label, text_x, text_y)
+                self.itemconfigure(label, text=text, state=state)
+            else:
+                polygon = self.create_polygon(
+                    pts,
+                    outline=Config.COLORS["error"],
+                    width=2,
+                    fill="",
+                    state=state,
+                    tags="overlay",
+                )
+                label = self.create_text(
+                    text_x,
+                    text_y,
+                    text=text,
+                    anchor=tk.SW,
+                    fill=Config.COLORS["error"],
+                    font=("Arial", 12, "bold"),
+                    state=state,
+                    tags=("overlay", "label"),
+                )
+            overlays.append((prob, polygon, label))
+
+        for _, polygon, label in self._overlays[len(overlays) :]:
+            self.delete(polygon, label)
+
+        self._overlays = overlays
+        self._overlay_probs = [prob for prob, _, _ in overlays]
+        self.tag_raise("overlay")
+
+    def set_min_confidence(self, value):
+        """Show only boxes with confidence >= value."""
+        low, high = sorted((self.min_confidence, value))
+        self.min_confidence = value
+
+        # Items are sorted by confidence, so only the slice between the old
+        # and the new threshold changes visibility
+        start = bisect_left(self._overlay_probs, low)
+        end = bisect_left(self._overlay_probs, high)
+        for prob, polygon, label in self._overlays[start:end]:
+            state = tk.NORMAL if prob >= value else tk.HIDDEN
+            self.itemconfigure(polygon, state=state)
+            self.itemconfigure(label, state=state)
 
     def on_resize(self, event):
         if self.image:
-            self.fit_image()
-            self.redraw()
+            # Configure events arrive much faster than we can render;
+            # coalesce them into at most one fast redraw per frame
+            if self._resize_job is None:
+                self._resize_job = self.after(
+                    self.RESIZE_INTERVAL_MS, self._apply_resize
+                )
         else:
             # Re-center placeholder
             self.delete("placeholder")
@@ -81,47 +256,179 @@ class ImageViewer(tk.Canvas):
                 tags="placeholder",
             )
 
-    def redraw(self):
-        self.delete("all")
+    def _apply_resize(self):
+        self._resize_job = None
+        fit_scale = self._fit_scale()
+        if self._fit or (fit_scale is not None and self.scale <= fit_scale):
+            self._fit = True
+            self.fit_image()
+        else:
+            self._clamp_offset()
+        self._interactive_redraw()
 
+    def on_mouse_wheel(self, event):
         if not self.image:
             return
 
-        # Rescale image
-        new_w = int(self.image.width * self.scale)
-        new_h = int(self.image.height * self.scale)
+        if event.num == 4 or (event.num != 5 and event.delta > 0):
+            self.zoom(self.ZOOM_STEP, event.x, event.y)
+        else:
+            self.zoom(1 / self.ZOOM_STEP, event.x, event.y)
 
-        resized = self.image.resize((new_w, new_h), Image.Resampling.LANCZOS)
-        self.tk_image = ImageTk.PhotoImage(resized)
+    def zoom(self, factor, x, y):
+        """Zoom by factor keeping the image point under (x, y) in place."""
+        fit_scale = self._fit_scale()
+        if fit_scale is None:
+            return
 
-        self.create_image(
-            self.offset_x, self.offset_y, anchor=tk.NW, image=self.tk_image
-        )
+        new_scale = min(max(self.scale * factor, fit_scale), self.MAX_ZOOM)
+        if new_scale == self.scale:
+            return
 
-        # Draw bounding boxes
-        for bbox, text, prob in self.ocr_results:
-            if prob < 0.3:
-                continue
+        if new_scale <= fit_scale:
+            self._fit = True
+            self.fit_image()
+        else:
+            self._fit = False
+            ratio = new_scale / self.scale
+            self.offset_x = round(x - (x - self.offset_x) * ratio)
+            self.offset_y = round(y - (y - self.offset_y) * ratio)
+            self.scale = new_scale
+            self._clamp_offset()
+        self._interactive_redraw()
 
-            pts = []
-            for x, y in bbox:
-                screen_x = x * self.scale + self.offset_x
-                screen_y = y * self.scale + self.offset_y
-                pts.append(screen_x)
-                pts.append(screen_y)
+    def on_reset_zoom(self, event):
+        if not self.image or self._fit:
+            return
+        self._fit = True
+        self.fit_image()
+        self._interactive_redraw()
 
-            # Draw polygon
-            self.create_polygon(pts, outline=Config.COLORS["error"], width=2, fill="")
+    def on_drag_start(self, event):
+        self._drag_from = (event.x, event.y)
 
-            # Draw text bg
-            text_x = pts[0]
-            text_y = pts[1] - 20
+    def on_drag(self, event):
+        if not self.image or self._drag_from is None:
+            return
 
-            self.create_text(
-                text_x,
-                text_y,
-                text=text,
-                anchor=tk.SW,
-                fill=Config.COLORS["error"],
-                font=("Arial", 12, "bold"),
-            )
+        offset = (self.offset_x, self.offset_y)
+        self.offset_x += event.x - self._drag_from[0]
+        self.offset_y += event.y - self._drag_from[1]
+        self._drag_from = (event.x, event.y)
+        self._clamp_offset()
+
+        if (self.offset_x, self.offset_y) != offset:
+            self._interactive_redraw()
+
+    def _interactive_redraw(self):
+        # Cheap preview now, full quality once the user stops
+        self.redraw(high_quality=False)
+
+        if self._settle_job is not None:
+            self.after_cancel(self._settle_job)
+        self._settle_job = self.after(self.SETTLE_DELAY_MS, self._settle)
+
+    def _settle(self):
+        self._settle_job = None
+        self.redraw(high_quality=True)
+
+    def _cancel_jobs(self):
+        for job in (self._resize_job, self._settle_job):
+            if job is not None:
+                self.after_cancel(job)
+        self._resize_job = None
+        self._settle_job = None
+
+    def redraw(self, high_quality=True):
+        if not self.image:
+            return
+
+        width, height = self._display_size()
+        tile = self.TILE_SIZE
+
+        # Only the part of the image inside the window is rendered
+        x0 = max(0, -self.offset_x)
+        y0 = max(0, -self.offset_y)
+        x1 = min(width, self.winfo_width() - self.offset_x)
+        y1 = min(height, self.winfo_height() - self.offset_y)
+
+        visible = set()
+        if x1 > x0 and y1 > y0:
+            for ty in range(y0 // tile, (y1 - 1) // tile + 1):
+                for tx in range(x0 // tile, (x1 - 1) // tile + 1):
+                    visible.add((tx, ty))
+
+        for pos in list(self._tile_items):
+            if pos not in visible:
+                self.delete(self._tile_items.pop(pos)[0])
+
+        for pos in visible:
+            photo = self._tile(pos, width, height, high_quality)
+            x = self.offset_x + pos[0] * tile
+            y = self.offset_y + pos[1] * tile
+
+            if pos in self._tile_items:
+                item, shown = self._tile_items[pos]
+                if shown is not photo:
+                    self.itemconfigure(item, image=photo)
+                self.coords(item, x, y)
+            else:
+                item = self.create_image(x, y, anchor=tk.NW, image=photo, tags="tile")
+            # The canvas doesn't keep a reference, so the tile must stay
+            # alive here even if it has been evicted from the cache
+            self._tile_items[pos] = (item, photo)
+
+        self.tag_raise("overlay")
+        self._transform_overlays()
+
+    def _tile(self, pos, width, height, high_quality):
+        # A fast redraw still uses high-quality tiles rendered before
+        qualities = (high_quality,) if high_quality else (True, False)
+        for quality in qualities:
+            key = (self.scale, quality) + pos
+            photo = self._tiles.get(key)
+            if photo is not None:
+                self._tiles.move_to_end(key)
+                return photo
+
+        photo = ImageTk.PhotoImage(self._render_tile(pos, width, height, high_quality))
+        self._tiles[(self.scale, high_quality) + pos] = photo
+        while len(self._tiles) > self.TILE_CACHE_SIZE:
+            self._tiles.popitem(last=False)
+        return photo
+
+    def _render_tile(self, pos, width, height, high_quality):
+        tile = self.TILE_SIZE
+        x0 = pos[0] * tile
+        y0 = pos[1] * tile
+        x1 = min(x0 + tile, width)
+        y1 = min(y0 + tile, height)
+
+        # Resample just the matching box of the nearest pyramid level
+        level = self._pyramid_level(width, height)
+        fx = level.width / width
+        fy = level.height / height
+        box = (x0 * fx, y0 * fy, x1 * fx, y1 * fy)
+
+        # The pyramid level is at most 2x the target, so nearest
+        # neighbour is an acceptable preview and costs almost nothing
+        resample = (
+            Image.Resampling.LANCZOS if high_quality else Image.Resampling.NEAREST
+        )
+        return level.resize((x1 - x0, y1 - y0), resample, box=box)
+
+    def _transform_overlays(self):
+        # Move the existing overlay items to the current view
+        # with two canvas calls instead of updating them one by one
+        if self._overlay_view is None:
+            return
+
+        old_scale, old_x, old_y = self._overlay_view
+        if old_scale != self.scale:
+            factor = self.scale / old_scale
+            # self.scale is the zoom factor, so call the Canvas method explicitly
+            tk.Canvas.scale(self, "overlay", old_x, old_y, factor, factor)
+            # Labels sit a fixed number of pixels above their box
+            self.move("label", 0, 20 * (factor - 1))
+        self.move("overlay", self.offset_x - old_x, self.offset_y - old_y)
+        self._overlay_view = (self.scale, self.offset_x, self.offset_y)
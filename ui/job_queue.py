@@ -0,0 +1,123 @@
+import queue
+import threading
+
+from ocr.image_io import load_image
+
+
+class Job:
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    def __init__(self, path):
+        self.path = path
+        self.status = Job.PENDING
+        self.ocr_results = []
+        self.parsed_address = {}
+        # Results so far come from the first OCR pass only
+        self.provisional = False
+        self.error = None
+
+    @property
+    def finished(self):
+        return self.status in (Job.DONE, Job.FAILED, Job.CANCELLED)
+
+
+class JobQueue:
+    """
+    Background processing of a stack of photos.
+
+    A loader thread decodes and hashes the next files ahead of time, so the
+    OCR thread goes from one image straight to the next without waiting
+    on disk. on_update(job, image) is called from the worker threads on
+    every status change and when provisional results of a running job
+    arrive; image is the decoded array when a job starts running and None
+    otherwise.
+    """
+
+    # Decoded images waiting for OCR; bounds memory on large stacks
+    PREFETCH = 2
+
+    def __init__(self, pipeline, on_update):
+        self.pipeline = pipeline
+        self.on_update = on_update
+
+        self._files = queue.Queue()
+        self._decoded = queue.Queue(maxsize=self.PREFETCH)
+        self._lock = threading.Lock()
+
+        threading.Thread(target=self._load_loop, name="job-loader", daemon=True).start()
+        threading.Thread(target=self._ocr_loop, name="job-ocr", daemon=True).start()
+
+    def submit(self, paths):
+        jobs = [Job(path) for path in paths]
+        for job in jobs:
+            self._files.put(job)
+        return jobs
+
+    def cancel(self, jobs):
+        """Cancel jobs that haven't started yet; running ones finish normally."""
+        for job in jobs:
+            with self._lock:
+                if job.status != Job.PENDING:
+                    continue
+                job.status = Job.CANCELLED
+            self.on_update(job, None)
+
+    def _load_loop(self):
+        while True:
+            job = self._files.get()
+            if job.status == Job.CANCELLED:
+                continue
+
+            try:
+                image = load_image(job.path)
+                # Hashing the file is much cheaper than hashing decoded pixels
+                cache_key = (
+                    self.pipeline.cache_key(job.path) if image is not None else None
+                )
+            except Exception as e:
+                image, cache_key = None, None
+                job.error = str(e)
+
+            self._decoded.put((job, image, cache_key))
+
+    def _ocr_loop(self):
+        while True:
+            job, image, cache_key = self._decoded.get()
+
+            with self._lock:
+                if job.status == Job.CANCELLED:
+                    continue
+                job.status = Job.RUNNING if image is not None else Job.FAILED
+
+            if image is None:
+                job.error = job.error or "Не удалось открыть файл"
+                self.on_update(job, None)
+                continue
+
+            self.on_update(job, image)
+            try:
+                job.ocr_results, job.parsed_address = self.pipeline.run(
+                    image,
+                    cache_key,
+                    on_partial=lambda *partial: self._partial(job, *partial),
+                )
+                job.provisional = False
+                job.status = Job.DONE
+            except Exception as e:
+                job.error = str(e)
+                # Don't leave the first-pass results looking like the answer
+                job.ocr_results = []
+                job.parsed_address = {}
+                job.provisional = False
+                job.status = Job.FAILED
+            self.on_update(job, None)
+
+    def _partial(self, job, ocr_results, parsed_address):
+        job.ocr_results = ocr_results
+        job.parsed_address = parsed_address
+        job.provisional = True
+        self.on_update(job, None)